@@ -0,0 +1,157 @@
+"""
+Columnar CSV parsing with pyarrow (optional dependency).
+
+ArrowCsvSource reads an upload, or a byte range of it, as Arrow record
+batches. normalize_batch applies the same normalization as the row-by-row
+path in app/tasks.py, as vectorized compute functions. For well-formed
+files both paths produce the same rows. Batches that the vectorized
+functions can't match exactly fall back to plain Python for that column:
+non-ASCII text, where Python's str.strip/str.lower and Arrow's Unicode
+tables differ, and prices that Arrow can't cast but Decimal might parse.
+Rows with a different number of fields than the header are rejected by
+Arrow, and such files need the default parser.
+"""
+import io
+from decimal import Decimal
+
+from app.csv_source import CsvSource, INACTIVE_VALUES
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+COLUMNS = ("sku", "name", "description", "price", "active")
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Characters removed by str.strip() within ASCII
+PY_ASCII_WHITESPACE = " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+class _RangeReader(io.RawIOBase):
+    """File-like view of a CSV header line followed by the byte range [start, end)"""
+
+    def __init__(self, filepath: str, start: int, end: int):
+        self._fh = open(filepath, "rb")
+        self._prefix = b""
+        if start > 0:
+            self._prefix = self._fh.readline()
+            self._fh.seek(start)
+        self._remaining = end - start
+        self.consumed = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._fh.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        self.consumed += len(data)
+        return len(data)
+
+    def close(self):
+        self._fh.close()
+        super().close()
+
+
+class ArrowCsvSource(CsvSource):
+    """
+    Columnar counterpart of CsvSource. Arrow reads ahead a block at a time,
+    so offset is approximate and only used for progress; a resumed import
+    skips the rows it already processed instead of seeking.
+    """
+
+    def __init__(self, filepath: str, start: int = None, end: int = None, skip_rows: int = 0):
+        if pa is None:
+            raise RuntimeError("The arrow CSV parser requires pyarrow (pip install pyarrow)")
+        super().__init__(filepath, start, end)
+        self.skip_rows = skip_rows
+
+    def __enter__(self):
+        self._fh = _RangeReader(self.filepath, self.begin, self.end)
+        return self
+
+    def iter_batches(self, max_rows: int):
+        """Yield record batches of at most max_rows rows, past skip_rows"""
+        reader = pa_csv.open_csv(
+            self._fh,
+            read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={column: pa.string() for column in COLUMNS},
+                include_columns=list(COLUMNS),
+                include_missing_columns=True,
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+        to_skip = self.skip_rows
+        for batch in reader:
+            self.offset = self.begin + self._fh.consumed
+            if to_skip >= batch.num_rows:
+                to_skip -= batch.num_rows
+                continue
+            for start in range(to_skip, batch.num_rows, max_rows):
+                yield batch.slice(start, max_rows)
+            to_skip = 0
+
+
+def _strip(column, lower: bool = False):
+    """Vectorized str.strip() (and str.lower()) of a string column"""
+    if pc.all(pc.string_is_ascii(column)).as_py() is not False:
+        column = pc.utf8_trim(column, characters=PY_ASCII_WHITESPACE)
+        return pc.ascii_lower(column) if lower else column
+    values = [value.strip() for value in column.to_pylist()]
+    if lower:
+        values = [value.lower() for value in values]
+    return pa.array(values, type=pa.string())
+
+
+def _to_decimal(value: str) -> Decimal:
+    try:
+        return Decimal(value)
+    except Exception:
+        return Decimal("0.00")
+
+
+def _prices(column) -> list:
+    """Vectorized Decimal((price or "0").strip()), 0.00 when it doesn't parse"""
+    column = _strip(pc.if_else(pc.equal(column, ""), "0", column))
+    try:
+        return pc.cast(column, pa.decimal128(38, 9)).to_pylist()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return [_to_decimal(value) for value in column.to_pylist()]
+
+
+def normalize_batch(batch) -> list:
+    """Normalize a record batch into upsert rows, dropping rows without a SKU"""
+    columns = {
+        column: batch.column(column).fill_null("")
+        for column in COLUMNS
+    }
+    sku = _strip(columns["sku"], lower=True)
+    keep = pc.not_equal(sku, "")
+    sku = pc.filter(sku, keep).to_pylist()
+    name = pc.filter(_strip(columns["name"]), keep).to_pylist()
+    description = pc.filter(_strip(columns["description"]), keep).to_pylist()
+    price = _prices(pc.filter(columns["price"], keep))
+    active = pc.invert(pc.is_in(
+        _strip(pc.filter(columns["active"], keep), lower=True),
+        value_set=pa.array(INACTIVE_VALUES)
+    )).to_pylist()
+
+    return [
+        {"sku": s, "name": n, "description": d, "price": p, "active": a}
+        for s, n, d, p, a in zip(sku, name, description, price, active)
+    ]
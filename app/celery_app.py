@@ -30,6 +30,20 @@ celery.conf.broker_use_ssl = {
 celery.conf.redis_backend_use_ssl = {
     "ssl_cert_reqs": ssl.CERT_NONE
 }
+# Periodic tasks, run by the beat scheduler embedded in the worker (-B)
+WEBHOOK_STATS_FLUSH_SECONDS = float(os.getenv("WEBHOOK_STATS_FLUSH_SECONDS", "10"))
+OUTBOX_RELAY_SECONDS = float(os.getenv("OUTBOX_RELAY_SECONDS", "1"))
+celery.conf.beat_schedule = {
+    "flush-webhook-stats": {
+        "task": "app.webhook_tasks.flush_webhook_stats",
+        "schedule": WEBHOOK_STATS_FLUSH_SECONDS,
+    },
+    "relay-outbox": {
+        "task": "app.webhook_tasks.relay_outbox",
+        "schedule": OUTBOX_RELAY_SECONDS,
+    },
+}
+
 # Windows compatibility
 if os.name == 'nt':
     celery.conf.update(
@@ -0,0 +1,166 @@
+"""
+Single-pass reading of uploaded CSV files.
+
+CsvSource reads the file as bytes, one line at a time, and feeds the decoded
+lines to csv.DictReader. The byte offset of the last record handed out is
+therefore always exact, which is what progress reporting is based on instead
+of counting the lines of the file up front.
+
+A source can also be limited to a byte range of the file (a shard), see
+find_shard_ranges, and can resume from a record boundary inside its range
+(an import checkpoint).
+"""
+import csv
+import os
+import re
+
+# How much of the file to look at when estimating the row count up front
+SAMPLE_BYTES = 64 * 1024
+
+# Values of the optional active column that mark a product inactive. Any
+# other value, an empty cell or no active column at all means active.
+INACTIVE_VALUES = ("false", "f", "0", "no", "n", "inactive")
+
+
+def parse_active(value) -> bool:
+    return (value or "").strip().lower() not in INACTIVE_VALUES
+
+
+class CsvSource:
+    def __init__(self, filepath: str, start: int = None, end: int = None, resume_offset: int = None):
+        self.filepath = filepath
+        self.size = os.path.getsize(filepath)
+        self.begin = start or 0
+        self.end = self.size if end is None else end
+        self.resume_offset = resume_offset
+        self.offset = self.begin if resume_offset is None else resume_offset
+        self.fieldnames = None
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.filepath, "rb")
+        if self.offset > 0:
+            # Reading starts mid-file, so take the column names from the header
+            self.fieldnames = next(csv.reader([self._fh.readline().decode("utf-8-sig")]), None)
+            self._fh.seek(self.offset)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._fh.close()
+        self._fh = None
+
+    def _lines(self):
+        # Binary lines always end on b"\n" and UTF-8 never uses that byte inside
+        # a multi-byte character, so every line decodes on its own. csv reads
+        # only the lines of the record it is building, so offset stays exact.
+        # A byte order mark (as Excel writes) is not part of the first column
+        # name; Arrow drops it too.
+        for line in self._fh:
+            if self.offset >= self.end:
+                break
+            text = line.decode("utf-8-sig" if self.offset == 0 else "utf-8")
+            self.offset += len(line)
+            yield text
+
+    def __iter__(self):
+        return iter(csv.DictReader(self._lines(), fieldnames=self.fieldnames))
+
+    @property
+    def consumed(self) -> int:
+        """Bytes of this source's range consumed so far"""
+        return self.offset - self.begin
+
+    @property
+    def percent(self) -> float:
+        """Share of the range consumed so far"""
+        length = self.end - self.begin
+        if length <= 0:
+            return 100
+        return round(self.consumed / length * 100, 2)
+
+    def estimate_total(self, processed: int) -> int:
+        """Extrapolate the number of records from the bytes consumed so far"""
+        if processed <= 0 or self.consumed <= 0:
+            return self.sample_total()
+        return max(processed, round(processed * (self.end - self.begin) / self.consumed))
+
+    def sample_total(self) -> int:
+        """Estimate the number of records from the first SAMPLE_BYTES of the file"""
+        with open(self.filepath, "rb") as fh:
+            sample = fh.read(SAMPLE_BYTES)
+        lines = sample.count(b"\n")
+        if len(sample) < SAMPLE_BYTES:
+            # Whole file sampled: exact line count, minus the header
+            if sample and not sample.endswith(b"\n"):
+                lines += 1
+            return max(lines - 1, 0)
+        if lines <= 1:
+            return 0
+        return round(self.size * lines / len(sample)) - 1
+
+
+# A quote opens a quoted field only at the start of a field, as in csv
+FIELD_QUOTE = re.compile(rb'(?:^|,)"')
+
+
+def _ends_in_quotes(line: bytes, in_quotes: bool) -> bool:
+    """
+    Whether a line ends inside a quoted field, given whether it started in
+    one. Follows csv's rules: a quote in the middle of an unquoted field
+    (12" pizza) is literal, and "" inside a quoted field is an escaped quote.
+    """
+    position = 0
+    while True:
+        if in_quotes:
+            quote = line.find(b'"', position)
+            if quote == -1:
+                return True
+            if line[quote + 1:quote + 2] == b'"':
+                position = quote + 2
+                continue
+            in_quotes = False
+            position = quote + 1
+        else:
+            match = FIELD_QUOTE.search(line, position)
+            if match is None:
+                return False
+            in_quotes = True
+            position = match.end()
+
+
+def find_shard_ranges(filepath: str, shards: int) -> list:
+    """
+    Split the data part of a CSV file into at most `shards` (start, end) byte
+    ranges that each begin on a record boundary.
+
+    Boundaries are found by following quoted fields from the start of the
+    file line by line: a newline only ends a record when it is outside a
+    quoted field, so fields with embedded newlines never get split. Only
+    quotes that csv itself treats as quoting count (see _ends_in_quotes),
+    so a stray quote inside an unquoted field doesn't throw off the rest.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as fh:
+        fh.readline()  # header
+        data_start = fh.tell()
+        if shards <= 1 or data_start >= size:
+            return [(data_start, size)]
+
+        targets = [data_start + (size - data_start) * i // shards for i in range(1, shards)]
+        boundaries = [data_start]
+        position = data_start
+        in_quotes = False
+        for line in fh:
+            if in_quotes or b'"' in line:
+                in_quotes = _ends_in_quotes(line, in_quotes)
+            position += len(line)
+            if in_quotes or position < targets[0] or position >= size:
+                continue
+            # The first record boundary at or after the target
+            boundaries.append(position)
+            targets = [target for target in targets if target > position]
+            if not targets:
+                break
+
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
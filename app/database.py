@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 load_dotenv()
@@ -6,8 +8,38 @@ import os
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Sync engine: Celery tasks, benchmarks and migrations
 engine = create_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Async engine (asyncpg) for the API. Every uvicorn worker gets its own pool
+# of DB_POOL_SIZE connections plus DB_MAX_OVERFLOW on bursts, so size them
+# against Postgres max_connections divided by the number of workers.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+
+def _async_url(url: str):
+    """DATABASE_URL with the asyncpg driver; asyncpg takes ssl instead of sslmode"""
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode:
+        query["ssl"] = sslmode
+    return url.set(query=query)
+
+
+async_engine = create_async_engine(
+    _async_url(DATABASE_URL),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 from app.models.webhook import Base as WebhookBase
 WebhookBase.metadata.create_all(bind=engine)
@@ -0,0 +1,75 @@
+"""
+Whole-file SKU deduplication for CSV imports.
+
+dedupe_csv rewrites an upload so that every SKU appears exactly once, keeping
+the last occurrence (the same rule _bulk_upsert applies within a batch).
+Memory stays bounded on files of any size: rows are first spilled to
+partition files by a hash of their SKU, then each partition is deduplicated
+in memory on its own. A partition holds roughly DEDUPE_PARTITION_BYTES of
+input, and all occurrences of a SKU land in the same partition.
+"""
+import csv
+import os
+import tempfile
+import zlib
+
+from app.csv_source import CsvSource
+
+DEDUPE_PARTITION_BYTES = int(os.getenv("DEDUPE_PARTITION_BYTES", str(64 * 1024 * 1024)))
+MAX_PARTITIONS = 256
+COLUMNS = ("sku", "name", "description", "price", "active")
+
+
+def dedupe_csv(filepath: str, output_path: str) -> dict:
+    """
+    Write the rows of filepath to output_path with one row per SKU.
+    Rows without a SKU are dropped, since the import skips them anyway.
+    Returns rows read, rows written and duplicate rows collapsed.
+    """
+    size = os.path.getsize(filepath)
+    partitions = min(MAX_PARTITIONS, max(1, -(-size // DEDUPE_PARTITION_BYTES)))
+    rows_read = 0
+    rows_written = 0
+    skipped = 0
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path) or None) as spill_dir:
+        spill_paths = [os.path.join(spill_dir, f"{i}.csv") for i in range(partitions)]
+
+        # Pass 1: spill rows to partitions, preserving file order within each
+        spill_files = [open(path, "w", newline="", encoding="utf-8") for path in spill_paths]
+        try:
+            writers = [csv.writer(fh) for fh in spill_files]
+            with CsvSource(filepath) as source:
+                for row in source:
+                    rows_read += 1
+                    sku = (row.get("sku") or "").strip().lower()
+                    if not sku:
+                        skipped += 1
+                        continue
+                    partition = zlib.crc32(sku.encode("utf-8")) % partitions
+                    writers[partition].writerow(
+                        [sku] + [row.get(column) or "" for column in COLUMNS[1:]]
+                    )
+        finally:
+            for fh in spill_files:
+                fh.close()
+
+        # Pass 2: last occurrence wins within each partition
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(COLUMNS)
+            for path in spill_paths:
+                latest = {}
+                with open(path, newline="", encoding="utf-8") as fh:
+                    for record in csv.reader(fh):
+                        latest[record[0]] = record
+                writer.writerows(latest.values())
+                rows_written += len(latest)
+        os.replace(tmp_path, output_path)
+
+    return {
+        "rows_read": rows_read,
+        "rows_written": rows_written,
+        "duplicates_collapsed": rows_read - skipped - rows_written,
+    }
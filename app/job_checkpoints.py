@@ -0,0 +1,46 @@
+"""
+Checkpoints of bulk product jobs, kept in Postgres.
+
+Import checkpoints live in Redis (app/progress.py), which is fine because
+replaying an imported batch is an idempotent upsert. A bulk update batch
+that multiplies prices is not idempotent, and a bulk delete's count would
+be off after a replay. These jobs save their checkpoint with the session
+of the batch, so it commits or rolls back together with the batch.
+
+A finished job's checkpoint is marked done rather than deleted: a retry
+or redelivery after the job completed then reports the result again
+instead of running the job a second time. Checkpoints older than
+JOB_CHECKPOINT_TTL are pruned when a job finishes.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.job_checkpoint import JobCheckpoint
+
+JOB_CHECKPOINT_TTL = int(os.getenv("JOB_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+
+
+def save_job_checkpoint(db, job_id: str, part: str, offset: int, counts: dict):
+    """Save a part's checkpoint in db's transaction; commit it with the batch"""
+    stmt = pg_insert(JobCheckpoint).values(job_id=job_id, part=part, offset=offset, counts=counts)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["job_id", "part"],
+        set_={"offset": stmt.excluded.offset, "counts": stmt.excluded.counts, "updated_at": stmt.excluded.updated_at}
+    ))
+
+
+def load_job_checkpoint(db, job_id: str, part: str):
+    """The saved {"offset", **counts} of a part, or None"""
+    checkpoint = db.execute(
+        select(JobCheckpoint).where(JobCheckpoint.job_id == job_id, JobCheckpoint.part == part)
+    ).scalar_one_or_none()
+    return {"offset": checkpoint.offset, **checkpoint.counts} if checkpoint else None
+
+
+def prune_job_checkpoints(db):
+    """Delete checkpoints not written to for JOB_CHECKPOINT_TTL, in db's transaction"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_CHECKPOINT_TTL)
+    db.execute(delete(JobCheckpoint).where(JobCheckpoint.updated_at < cutoff))
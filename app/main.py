@@ -1,27 +1,51 @@
 import os
+import time
 import uuid
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Query, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Query, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from starlette.responses import StreamingResponse
 import redis
 import json
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.webhook import Webhook, Base as WebhookBase
 from app.schemas.webhook import WebhookCreate, WebhookUpdate, WebhookResponse, WebhookTestResponse
-from app.webhook_tasks import test_webhook_sync, trigger_webhooks_for_event
-from datetime import datetime
-from app.database import SessionLocal
+from app.webhook_tasks import test_webhook_async
+from app.webhook_registry import notify_webhooks_changed
+from app.webhook_stats import pending_stats, merge_pending
+from app.webhook_breaker import breaker_states
+from app.database import AsyncSessionLocal
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from app.tasks import process_csv_task
-from app.progress import redis_client
+from app.outbox import add_event, insert_events
+from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductBulkUpdate
+from app.product_queries import apply_product_filters, keyset_page, order_by_relevance, suggest_skus
+from app.product_export import export_query, stream_export, EXPORT_MEDIA_TYPES
+from app.product_batch import batch_upsert
+from app.product_changes import add_tombstone, changes_page, CURRENT_XID
+from app.product_bulk import (
+    matching_ids, patch_values, highest_price, price_overflows, is_invalid_value,
+    update_statement, updated_events, BULK_UPDATE_INLINE_MAX
+)
+from app.product_cache import (
+    count_products, invalidate_products_async, listing_filters, LRUCache,
+    get_cached_product, cache_product, products_generation, page_key, get_cached_page, cache_page, cache_stats
+)
+from app.tasks import process_csv_task, bulk_delete_task, bulk_update_task, INGEST_ENGINES, CSV_PARSERS
+from app.progress import async_redis_client, progress_state_key
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Hot autocomplete prefixes, answered without a database round-trip
+suggest_cache = LRUCache(
+    maxsize=int(os.getenv("SUGGEST_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("SUGGEST_CACHE_TTL", "30"))
+)
+
 app = FastAPI()
 REDIS_URL= os.getenv("REDIS_URL")
 print(REDIS_URL)
@@ -33,89 +57,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def get_webhook_or_404(db: AsyncSession, webhook_id: int) -> Webhook:
+    webhook = await db.get(Webhook, webhook_id)
+    if not webhook:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return webhook
+
+async def get_product_or_404(db: AsyncSession, product_id: int) -> Product:
+    product = await db.get(Product, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
 
 #Webhook routes
 
+async def webhook_responses(webhooks: list) -> list:
+    """
+    Webhook responses including delivery statistics not flushed to the table
+    yet and the state of each webhook's circuit breaker
+    """
+    ids = [webhook.id for webhook in webhooks]
+    pending = await pending_stats(ids)
+    breakers = await breaker_states(ids)
+    return [
+        {**merge_pending(WebhookResponse.from_orm(webhook).dict(), pending), **breakers[webhook.id]}
+        for webhook in webhooks
+    ]
+
 @app.get("/webhooks", response_model=list[WebhookResponse])
-def list_webhooks(db: Session = Depends(get_db)):
+async def list_webhooks(db: AsyncSession = Depends(get_db)):
     """List all webhooks"""
-    webhooks = db.query(Webhook).order_by(Webhook.created_at.desc()).all()
-    return webhooks
+    webhooks = (await db.scalars(select(Webhook).order_by(Webhook.created_at.desc()))).all()
+    return await webhook_responses(webhooks)
 
 @app.post("/webhooks", response_model=WebhookResponse)
-def create_webhook(webhook: WebhookCreate, db: Session = Depends(get_db)):
+async def create_webhook(webhook: WebhookCreate, db: AsyncSession = Depends(get_db)):
     """Create a new webhook"""
     db_webhook = Webhook(**webhook.dict())
     db.add(db_webhook)
-    db.commit()
-    db.refresh(db_webhook)
+    await db.commit()
+    await notify_webhooks_changed()
+    await db.refresh(db_webhook)
     return db_webhook
 
 @app.get("/webhooks/{webhook_id}", response_model=WebhookResponse)
-def get_webhook(webhook_id: int, db: Session = Depends(get_db)):
+async def get_webhook(webhook_id: int, db: AsyncSession = Depends(get_db)):
     """Get a single webhook by ID"""
-    webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-    if not webhook:
-        raise HTTPException(status_code=404, detail="Webhook not found")
-    return webhook
+    webhook = await get_webhook_or_404(db, webhook_id)
+    return (await webhook_responses([webhook]))[0]
 
 @app.put("/webhooks/{webhook_id}", response_model=WebhookResponse)
-def update_webhook(
+async def update_webhook(
     webhook_id: int,
     webhook_update: WebhookUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update an existing webhook"""
-    db_webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-    if not db_webhook:
-        raise HTTPException(status_code=404, detail="Webhook not found")
+    db_webhook = await get_webhook_or_404(db, webhook_id)
     
     # Update fields
     for field, value in webhook_update.dict(exclude_unset=True).items():
         setattr(db_webhook, field, value)
     
-    db.commit()
-    db.refresh(db_webhook)
-    return db_webhook
+    await db.commit()
+    await notify_webhooks_changed()
+    await db.refresh(db_webhook)
+    return (await webhook_responses([db_webhook]))[0]
 
 @app.delete("/webhooks/{webhook_id}")
-def delete_webhook(webhook_id: int, db: Session = Depends(get_db)):
+async def delete_webhook(webhook_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a webhook"""
-    db_webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-    if not db_webhook:
-        raise HTTPException(status_code=404, detail="Webhook not found")
+    db_webhook = await get_webhook_or_404(db, webhook_id)
     
-    db.delete(db_webhook)
-    db.commit()
+    await db.delete(db_webhook)
+    await db.commit()
+    await notify_webhooks_changed()
     return {"message": "Webhook deleted successfully"}
 
 @app.post("/webhooks/{webhook_id}/test", response_model=WebhookTestResponse)
-def test_webhook(webhook_id: int, db: Session = Depends(get_db)):
+async def test_webhook(webhook_id: int, db: AsyncSession = Depends(get_db)):
     """Test a webhook by sending a sample event"""
-    webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-    if not webhook:
-        raise HTTPException(status_code=404, detail="Webhook not found")
+    webhook = await get_webhook_or_404(db, webhook_id)
     
-    # Test webhook synchronously to return immediate results
-    result = test_webhook_sync(webhook_id)
+    # Send the test event and wait for the result without blocking a thread
+    result = await test_webhook_async(webhook)
     return result
 
 @app.post("/webhooks/{webhook_id}/toggle")
-def toggle_webhook(webhook_id: int, db: Session = Depends(get_db)):
+async def toggle_webhook(webhook_id: int, db: AsyncSession = Depends(get_db)):
     """Enable/disable a webhook"""
-    webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-    if not webhook:
-        raise HTTPException(status_code=404, detail="Webhook not found")
+    webhook = await get_webhook_or_404(db, webhook_id)
     
     webhook.enabled = not webhook.enabled
-    db.commit()
-    db.refresh(webhook)
+    await db.commit()
+    await notify_webhooks_changed()
+    await db.refresh(webhook)
     
     return {
         "message": f"Webhook {'enabled' if webhook.enabled else 'disabled'}",
@@ -125,9 +165,27 @@ def toggle_webhook(webhook_id: int, db: Session = Depends(get_db)):
 #Product routes
 
 @app.post("/upload")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    ingest_engine: Optional[str] = Query(None),
+    shards: Optional[int] = Query(None, ge=1, le=32),
+    skip_unchanged: Optional[bool] = Query(None),
+    dedupe: Optional[bool] = Query(None),
+    parser: Optional[str] = Query(None),
+    sync: Optional[str] = Query(None, pattern="^(deactivate|delete)$")
+):
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV allowed")
+    if ingest_engine and ingest_engine not in INGEST_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"ingest_engine must be one of {list(INGEST_ENGINES)}"
+        )
+    if parser and parser not in CSV_PARSERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"parser must be one of {list(CSV_PARSERS)}"
+        )
     job_id = str(uuid.uuid4())
     save_path = os.path.join(UPLOAD_DIR, f"{job_id}.csv")
     # Save streaming to disk to avoid memory blow
@@ -139,25 +197,29 @@ async def upload_csv(file: UploadFile = File(...)):
             fh.write(chunk)
 
     # publish initial status
-    redis_client.publish(f"progress:{job_id}", json.dumps({"status": "uploaded", "percent": 0}))
+    await async_redis_client.publish(f"progress:{job_id}", json.dumps({"status": "uploaded", "percent": 0}))
 
     # enqueue celery task
-    process_csv_task.delay(job_id, save_path)
+    process_csv_task.delay(job_id, save_path, ingest_engine, shards, skip_unchanged, dedupe, parser, sync)
 
     return JSONResponse({"job_id": job_id})
 
 @app.get("/progress/{job_id}")
-def progress_sse(job_id: str):
+async def progress_sse(job_id: str):
     """
     Returns Server-Sent Events that stream progress messages from Redis pub/sub
     """
-    pubsub = redis_client.pubsub()
+    pubsub = async_redis_client.pubsub()
     channel = f"progress:{job_id}"
-    pubsub.subscribe(channel)
+    await pubsub.subscribe(channel)
+    # A job may have reported (or finished) before this client subscribed
+    last = await async_redis_client.get(progress_state_key(job_id))
 
-    def event_stream():
+    async def event_stream():
         try:
-            for message in pubsub.listen():
+            if last:
+                yield f"data: {last.decode('utf-8')}\n\n"
+            async for message in pubsub.listen():
                 # message example: {'type': 'message', 'pattern': None, 'channel': b'progress:abc', 'data': b'...'}
                 if message is None:
                     continue
@@ -171,89 +233,214 @@ def progress_sse(job_id: str):
                     payload = str(data)
                 yield f"data: {payload}\n\n"
         finally:
-            pubsub.close()
+            await pubsub.aclose()
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 # ==================== PRODUCT CRUD ENDPOINTS ====================
 
 @app.delete("/products/bulk-delete")
-def bulk_delete_products(db: Session = Depends(get_db)):
-    """Delete all products (Story 3)"""
-    try:
-        count = db.query(Product).count()
-        if count == 0:
-            return {
-                "success": True,
-                "message": "No products to delete",
-                "deleted_count": 0
-            }
-        
-        db.query(Product).delete()
-        db.commit()
-        from app.webhook_tasks import trigger_webhooks_for_event
-        trigger_webhooks_for_event.delay('product.bulk_deleted', {
-            "deleted_count": count,
-            "timestamp": datetime.utcnow().isoformat(),
-            "operation": "bulk_delete"
-        })
+async def bulk_delete_products(
+    search: Optional[str] = Query(None),
+    active: Optional[str] = Query(None)
+):
+    """
+    Delete all products, or those matching search/active, in a background
+    job (Story 3). Progress streams on /progress/{job_id}.
+    """
+    job_id = str(uuid.uuid4())
+    bulk_delete_task.delay(job_id, search, active)
+    return {
+        "success": True,
+        "job_id": job_id,
+        "message": "Bulk delete started"
+    }
 
+@app.post("/products/bulk-update")
+async def bulk_update_products(bulk_update: ProductBulkUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Apply one patch (active, price or price_multiplier) to every product
+    matching the selectors, as a single UPDATE. Sets larger than
+    BULK_UPDATE_INLINE_MAX are updated by a background job instead, whose
+    progress streams on /progress/{job_id}.
+    """
+    patch = bulk_update.patch.dict()
+    if not patch_values(patch):
+        raise HTTPException(status_code=400, detail="patch must set active, price or price_multiplier")
+    if patch["price"] is not None and patch["price_multiplier"] is not None:
+        raise HTTPException(status_code=400, detail="patch can't set both price and price_multiplier")
+
+    selectors = bulk_update.dict(exclude={"patch"})
+    matching = matching_ids(**selectors)
+    # Checked up front: a background job commits batch by batch and would
+    # stop halfway through
+    if patch["price_multiplier"] is not None and price_overflows(await db.scalar(highest_price(matching)), patch):
+        raise HTTPException(status_code=400, detail="price_multiplier would put prices out of range")
+    # Count no further than needed to choose between inline and background
+    matched = await db.scalar(
+        select(func.count()).select_from(matching.limit(BULK_UPDATE_INLINE_MAX + 1).subquery())
+    )
+    if matched > BULK_UPDATE_INLINE_MAX:
+        job_id = str(uuid.uuid4())
+        bulk_update_task.delay(job_id, selectors, patch)
         return {
             "success": True,
-            "message": f"Successfully deleted {count} product(s)",
-            "deleted_count": count
+            "job_id": job_id,
+            "message": "Bulk update started"
         }
+
+    started_at = time.perf_counter()
+    try:
+        rows = (await db.execute(update_statement(matching, patch))).all()
+        if rows:
+            await db.execute(insert_events(updated_events(rows)))
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        if isinstance(e, DBAPIError) and is_invalid_value(e):
+            # e.g. a price out of range, from products changed since the check
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid patch: {str(e.orig)}"
+            )
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to delete products: {str(e)}"
+            detail=f"Failed to update products: {str(e)}"
         )
+    elapsed = time.perf_counter() - started_at
+    await invalidate_products_async([row.id for row in rows])
+    return {
+        "success": True,
+        "matched": matched,
+        "updated_count": len(rows),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None
+    }
 
 @app.get("/products")
-def list_products(
+async def list_products(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
     active: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|sku)$"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """List products with pagination and filtering"""
-    query = db.query(Product)
-    
-    # Apply filters
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (func.lower(Product.sku).like(func.lower(search_term))) |
-            (func.lower(Product.name).like(func.lower(search_term))) |
-            (func.lower(Product.description).like(func.lower(search_term)))
-        )
-    
-    if active and active != "all":
-        is_active = active.lower() == "true"
-        query = query.filter(Product.active == is_active)
+    """
+    List products with pagination and filtering.
+
+    Searches are ranked by relevance. Passing `cursor` (empty for the first
+    page) switches to keyset pagination ordered by `sort`, returning
+    `next_cursor`/`prev_cursor` instead of `total`/`page`.
+    """
+    filters = listing_filters(search, active)
+    if cursor is not None:
+        position = {"cursor": cursor, "sort": sort, "limit": limit}
+    else:
+        position = {"page": page, "limit": limit}
+    cache_key = await page_key({**filters, **position})
+    cached = await get_cached_page(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    query = apply_product_filters(select(Product), search, active)
+
+    if cursor is not None:
+        try:
+            result = await keyset_page(db, query, sort, limit, cursor or None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = jsonable_encoder({
+            "products": [ProductResponse.from_orm(p) for p in result["products"]],
+            "next_cursor": result["next_cursor"],
+            "prev_cursor": result["prev_cursor"],
+            "limit": limit
+        })
+        await cache_page(cache_key, response)
+        return response
     
-    # Get total count
-    total = query.count()
+    # Get total count (cached, or estimated for large unfiltered listings)
+    total, total_exact = await count_products(db, query, filters)
     
+    if search:
+        query = order_by_relevance(query, search)
+
     # Apply pagination
     offset = (page - 1) * limit
-    products = query.offset(offset).limit(limit).all()
+    products = (await db.scalars(query.offset(offset).limit(limit))).all()
     
-    return {
+    response = jsonable_encoder({
         "products": [ProductResponse.from_orm(p) for p in products],
         "total": total,
+        "total_exact": total_exact,
         "page": page,
         "limit": limit
-    }
+    })
+    await cache_page(cache_key, response)
+    return response
+
+@app.get("/products/suggest")
+async def suggest_products(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """Autocomplete SKUs starting with prefix"""
+    prefix = prefix.strip().lower()
+    key = (prefix, limit)
+    suggestions = suggest_cache.get(key)
+    if suggestions is None:
+        suggestions = await suggest_skus(db, prefix, limit)
+        suggest_cache.set(key, suggestions)
+    return {"prefix": prefix, "suggestions": suggestions}
+
+@app.get("/products/cache-stats")
+async def product_cache_stats():
+    """Hit/miss counters of the product read cache"""
+    return await cache_stats()
+
+@app.get("/products/export")
+async def export_products(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    search: Optional[str] = None,
+    active: Optional[str] = None
+):
+    """
+    Stream the products matching the filters of GET /products as CSV (in
+    the import file format) or NDJSON, optionally gzipped
+    """
+    filename = f"products.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(export_query(search, active), fmt, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/products/changes")
+async def product_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Products written and deleted since a cursor, for consumers keeping a
+    copy of the catalog. Start without since, then pass the next_cursor of
+    each response; has_more means another page is ready right away. reset
+    means the table was emptied: drop the copy and start over.
+    """
+    try:
+        return await changes_page(db, since, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/products", response_model=ProductResponse)
-def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
     """Create a new product"""
-    existing = db.query(Product).filter(
+    existing = await db.scalar(select(Product).filter(
         func.lower(Product.sku) == func.lower(product.sku)
-    ).first()
+    ).limit(1))
     
     if existing:
         raise HTTPException(
@@ -263,43 +450,60 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db)):
     
     db_product = Product(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
-
-    trigger_webhooks_for_event.delay('product.created', {
+    await db.flush()
+    add_event(db, 'product.created', {
         "product_id": db_product.id,
         "sku": db_product.sku,
         "name": db_product.name,
         "price": str(db_product.price)
     })
+    await db.commit()
+    await db.refresh(db_product)
+    await invalidate_products_async()
     
     return db_product
 
+@app.post("/products/batch")
+async def batch_upsert_products(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Create or update many products in one request. The body is NDJSON (one
+    ProductCreate object per line) or a JSON array of them, and is read as
+    a stream. Products are matched by SKU, like CSV imports.
+    """
+    result = await batch_upsert(db, request.stream())
+    if result.get("error") and not result["processed"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
 @app.get("/products/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
     """Get a single product by ID"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    cached = await get_cached_product(product_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    # Taken before the read, so a write committed in between keeps it out of the cache
+    generation = await products_generation()
+    product = await get_product_or_404(db, product_id)
+    response = ProductResponse.from_orm(product).dict()
+    await cache_product(product_id, response, generation)
+    return response
 
 @app.put("/products/{product_id}", response_model=ProductResponse)
-def update_product(
+async def update_product(
     product_id: int, 
     product_update: ProductUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update an existing product"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    db_product = await get_product_or_404(db, product_id)
     
     # Check for SKU conflict if SKU is being updated
     if product_update.sku and product_update.sku.lower() != db_product.sku.lower():
-        existing = db.query(Product).filter(
+        existing = await db.scalar(select(Product).filter(
             func.lower(Product.sku) == func.lower(product_update.sku),
             Product.id != product_id
-        ).first()
+        ).limit(1))
         if existing:
             raise HTTPException(
                 status_code=400,
@@ -309,24 +513,25 @@ def update_product(
     # Update fields
     for field, value in product_update.dict(exclude_unset=True).items():
         setattr(db_product, field, value)
+    db_product.change_xid = CURRENT_XID
     
-    db.commit()
-    db.refresh(db_product)
-
-    trigger_webhooks_for_event.delay('product.updated', {
+    # Flushing locks the row, so concurrent updates get their events in commit order
+    await db.flush()
+    add_event(db, 'product.updated', {
         "product_id": db_product.id,
         "sku": db_product.sku,
         "name": db_product.name,
         "price": str(db_product.price)
     })
+    await db.commit()
+    await db.refresh(db_product)
+    await invalidate_products_async([product_id])
     return db_product
 
 @app.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a product"""
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    db_product = await get_product_or_404(db, product_id)
     
     product_data = {
         "product_id": db_product.id,
@@ -334,17 +539,20 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
         "name": db_product.name
     }
 
-    db.delete(db_product)
-    db.commit()
-    trigger_webhooks_for_event.delay('product.deleted', product_data)
+    await db.delete(db_product)
+    await db.flush()
+    add_tombstone(db, db_product)
+    add_event(db, 'product.deleted', product_data)
+    await db.commit()
+    await invalidate_products_async([product_id])
     return {"message": "Product deleted successfully"}
 
 #Health checks
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Acme Product Manager API", "version": "1.0.0"}
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy"}
\ No newline at end of file
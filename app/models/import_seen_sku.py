@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String
+
+from app.models.product import Base
+
+class ImportSeenSku(Base):
+    """
+    SKUs read so far by a sync import, so products missing from the file
+    can be found with one anti-join when it completes. The rows are
+    deleted then. Not UNLOGGED: a crash would empty the table while the
+    import's checkpoints survive, and the resumed job would treat every
+    product imported before the crash as missing.
+    """
+    __tablename__ = "import_seen_skus"
+
+    job_id = Column(String(36), primary_key=True)
+    sku = Column(String(100), primary_key=True)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from app.models.product import Base
+
+class JobCheckpoint(Base):
+    """
+    How far a part of a bulk product job got: the last id it reached and
+    its counters. Written in the same transaction as the batch it covers.
+    """
+    __tablename__ = "job_checkpoints"
+
+    job_id = Column(String(36), primary_key=True)
+    part = Column(String(50), primary_key=True)
+    offset = Column(BigInteger, nullable=False)
+    counts = Column(JSONB, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<JobCheckpoint {self.job_id} {self.part}>"
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+from app.models.product import Base
+
+class OutboxEvent(Base):
+    """
+    A product event waiting to be relayed to the webhook pipeline. Written
+    in the same transaction as the change it describes; the relay deletes
+    it once it has been handed on.
+    """
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger, primary_key=True)
+    event_type = Column(String(100), nullable=False)
+    product_id = Column(Integer, nullable=True)  # None for events about many products
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.id} {self.event_type}>"
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, Index
+from decimal import Decimal
+
+from sqlalchemy import Column, BigInteger, Integer, String, Numeric, Boolean, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import validates
 
 Base = declarative_base()
 
+# Id of the current transaction as a bigint: what change_xid columns are stamped with
+CURRENT_XID_SQL = "pg_current_xact_id()::text::bigint"
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -13,12 +18,21 @@ class Product(Base):
     description = Column(String(500))
     price = Column(Numeric(10, 2), nullable=False)
     active = Column(Boolean, default=True)
+    # Transaction that last wrote the row, for GET /products/changes
+    change_xid = Column(BigInteger, nullable=False, server_default=text(f"({CURRENT_XID_SQL})"))
 
     # Case sensitive uniqueness on SKU
     __table_args__ = (
         Index("ix_unique_sku_lower", "sku", unique=True, postgresql_using="btree", postgresql_ops={"sku": "varchar_pattern_ops"}),
+        # Keyset pagination in SKU order (pattern_ops indexes can't serve ORDER BY)
+        Index("ix_products_sku_id", "sku", "id"),
+        Index("ix_products_change_xid_id", "change_xid", "id"),
     )
 
     @validates("sku")
     def normalize_sku(self, key, value):
         return value.lower()
+
+
+# Prices must stay below this to fit the price column (numeric(10, 2))
+MAX_PRICE = Decimal(10) ** (Product.__table__.c.price.type.precision - Product.__table__.c.price.type.scale)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Index, text
+from datetime import datetime
+
+from app.models.product import Base, CURRENT_XID_SQL
+
+class ProductTombstone(Base):
+    """
+    A deleted product, kept so GET /products/changes can report the delete.
+    A tombstone without a product_id is a reset marker: the whole table was
+    truncated, and consumers that synced before it have to start over.
+    """
+    __tablename__ = "product_tombstones"
+    __table_args__ = (
+        Index("ix_product_tombstones_change_xid_id", "change_xid", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    product_id = Column(Integer, nullable=True)
+    sku = Column(String(100), nullable=True)
+    change_xid = Column(BigInteger, nullable=False, server_default=text(f"({CURRENT_XID_SQL})"))
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ProductTombstone {self.id} product={self.product_id}>"
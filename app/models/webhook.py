@@ -14,6 +14,9 @@ class Webhook(Base):
     enabled = Column(Boolean, default=True)
     secret = Column(String(255), nullable=True)  # Optional webhook secret for signing
     headers = Column(Text, nullable=True)  # JSON string of custom headers
+    # Batching: events are buffered and delivered as one JSON array when either is set
+    batch_window_seconds = Column(Integer, nullable=True)
+    batch_max_events = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -0,0 +1,117 @@
+"""
+Transactional outbox for product events.
+
+The product routes add an OutboxEvent to the session of the change they
+make, so the event is committed or rolled back with it: no event is lost
+when the broker is unavailable, and none is sent for a change that failed.
+The request itself doesn't talk to Redis or Celery at all. relay_outbox
+(run by Celery beat) reads committed events in batches, hands them to the
+webhook pipeline and then deletes them.
+
+Only one relay runs at a time: it holds a session-level advisory lock on
+its own connection (relay_lock). So it can read a batch in one short
+transaction and delete it in another. The deliveries in between happen
+with no transaction open. Nothing stays locked and vacuum isn't held back
+while webhooks are called, and the relay doesn't pin the snapshot xmin
+that GET /products/changes waits for. A relay that dies before deleting
+its batch leaves it in the outbox, so the next one sends it again.
+
+Events about one product are relayed in the order they were committed. The
+routes lock the product row (by flushing the change) before adding its
+event, so a later change to the same product always gets a higher id.
+"""
+import os
+
+from contextlib import contextmanager
+
+from sqlalchemy import delete, insert, text
+
+from app.models.outbox import OutboxEvent
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+# A relay stops draining after this long, so it doesn't hold a worker forever
+OUTBOX_RELAY_MAX_SECONDS = float(os.getenv("OUTBOX_RELAY_MAX_SECONDS", "30"))
+# Advisory lock key held by the relay draining the outbox
+OUTBOX_RELAY_LOCK = 0x0b0c5e7
+
+PENDING_SQL = text("""
+    SELECT id, event_type, product_id, payload, created_at
+    FROM outbox_events ORDER BY id LIMIT :limit
+""")
+
+
+def add_event(db, event_type: str, payload: dict):
+    """
+    Add an event to the outbox in the session's transaction (sync or async
+    session). Flush the change the event describes first.
+    """
+    db.add(OutboxEvent(event_type=event_type, product_id=payload.get("product_id"), payload=payload))
+
+
+def insert_events(events: list):
+    """
+    INSERT of (event_type, payload) events into the outbox, for many events
+    at once; execute it in the transaction of the change, after its writes
+    """
+    return insert(OutboxEvent).values([
+        {"event_type": event_type, "product_id": payload.get("product_id"), "payload": payload}
+        for event_type, payload in events
+    ])
+
+
+@contextmanager
+def relay_lock(engine):
+    """
+    Yield a connection holding the relay's advisory lock, or None while
+    another relay holds it. The lock is taken at session level, so it
+    outlives the connection's transactions.
+    """
+    with engine.connect() as conn:
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": OUTBOX_RELAY_LOCK}).scalar()
+        conn.commit()
+        if not locked:
+            yield None
+            return
+        try:
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": OUTBOX_RELAY_LOCK})
+                conn.commit()
+            except Exception:
+                # Don't hand a connection that may still hold the lock back to the pool
+                conn.invalidate()
+                raise
+
+
+def pending_events(conn, limit: int = OUTBOX_BATCH_SIZE) -> list:
+    """Up to limit of the oldest events in the outbox, in id order, read in their own transaction"""
+    events = conn.execute(PENDING_SQL, {"limit": limit}).all()
+    conn.commit()
+    return events
+
+
+def delete_events(conn, events: list):
+    """Remove relayed events from the outbox"""
+    conn.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([event.id for event in events])))
+    conn.commit()
+
+
+def delivery_rounds(events: list) -> list:
+    """
+    Split events into rounds that can each be delivered concurrently: round
+    n holds the n-th event of every product, so a product's events go out
+    one after the other. Events without a product_id go in the first round.
+    """
+    rounds = []
+    seen = {}
+    for event in events:
+        n = 0
+        if event.product_id is not None:
+            n = seen.get(event.product_id, 0)
+            seen[event.product_id] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(event)
+    return rounds
@@ -0,0 +1,260 @@
+"""
+Batch upserts for POST /products/batch.
+
+The request body is read as a stream, either NDJSON (one product per line)
+or a JSON array, and parsed item by item, so a large batch is never held in
+memory as a whole. Items are validated with ProductCreate, normalized like
+imported rows, and upserted BATCH_UPSERT_CHUNK at a time with the import's
+INSERT ... ON CONFLICT statement: one round-trip per chunk instead of three
+per product. Each chunk commits on its own together with its outbox events,
+one per product whose row was inserted or changed.
+"""
+import codecs
+import json
+import os
+from decimal import Decimal, ROUND_HALF_UP
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from app.models.product import Product, MAX_PRICE
+from app.outbox import insert_events
+from app.product_cache import invalidate_products_async
+from app.schemas.product import ProductCreate
+from app.product_upsert import UPSERT_INSERTED, unique_rows, upsert_statement
+
+BATCH_UPSERT_CHUNK = int(os.getenv("BATCH_UPSERT_CHUNK", "1000"))
+
+# What the products columns can store, checked per item so one oversized
+# value doesn't fail the INSERT of its whole chunk
+_columns = Product.__table__.c
+MAX_LENGTHS = {column: _columns[column].type.length for column in ("sku", "name", "description")}
+CENT = Decimal("0.01")
+
+_json = json.JSONDecoder()
+
+
+class ArrayParser:
+    """Incremental parser of the items of a JSON array fed in pieces"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.started = False
+        self.done = False
+        self.expect_value = True
+        self.count = 0
+
+    def feed(self, text: str, final: bool = False) -> list:
+        self.buffer += text
+        items = []
+        pos = 0
+        while True:
+            while pos < len(self.buffer) and self.buffer[pos].isspace():
+                pos += 1
+            if pos == len(self.buffer):
+                break
+            char = self.buffer[pos]
+            if self.done:
+                raise ValueError("Unexpected data after the JSON array")
+            if not self.started:
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                self.started = True
+                pos += 1
+            elif char == "]" and (not self.expect_value or self.count == 0):
+                self.done = True
+                pos += 1
+            elif self.expect_value:
+                try:
+                    item, end = _json.raw_decode(self.buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError(f"Malformed JSON array at item {self.count}")
+                    break
+                if end == len(self.buffer) and not final:
+                    # A number may continue in the next piece
+                    break
+                items.append(item)
+                self.count += 1
+                self.expect_value = False
+                pos = end
+            elif char == ",":
+                self.expect_value = True
+                pos += 1
+            else:
+                raise ValueError("Expected ',' or ']' between array items")
+        self.buffer = self.buffer[pos:]
+        if final and not self.done:
+            raise ValueError("Unterminated JSON array")
+        return items
+
+
+async def iter_items(stream):
+    """
+    Yield the items of a request body streamed as NDJSON or as a JSON array
+    (told apart by its first character). NDJSON lines that aren't valid
+    JSON are yielded as ValueErrors; a malformed array raises ValueError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    array = None
+    buffer = ""
+    async for chunk in stream:
+        text = decoder.decode(chunk)
+        if array is None:
+            buffer += text
+            if not buffer.strip():
+                continue
+            array = ArrayParser() if buffer.lstrip()[0] == "[" else False
+            text, buffer = buffer, ""
+        if array:
+            for item in array.feed(text):
+                yield item
+        else:
+            buffer += text
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+    text = decoder.decode(b"", final=True)
+    if array:
+        for item in array.feed(text, final=True):
+            yield item
+    elif (buffer + text).strip():
+        yield _parse_line(buffer + text)
+
+
+def _parse_line(line: str):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return ValueError(f"Invalid JSON: {exc}")
+
+
+def validate_item(item) -> tuple:
+    """(normalized row, None) for a valid item, else (None, list of errors)"""
+    if isinstance(item, ValueError):
+        return None, [{"msg": str(item)}]
+    if not isinstance(item, dict):
+        return None, [{"msg": "Item must be a JSON object"}]
+    try:
+        product = ProductCreate(**item)
+    except ValidationError as exc:
+        return None, [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()]
+    sku = product.sku.strip().lower()
+    if not sku:
+        return None, [{"loc": ["sku"], "msg": "SKU must not be empty"}]
+    row = {
+        "sku": sku,
+        "name": product.name.strip(),
+        "description": (product.description or "").strip(),
+        "price": Decimal(str(product.price)),
+        "active": product.active,
+    }
+    errors = [
+        {"loc": [column], "msg": f"Must be at most {length} characters"}
+        for column, length in MAX_LENGTHS.items() if len(row[column]) > length
+    ]
+    if not row["price"].is_finite() or abs(row["price"].quantize(CENT, ROUND_HALF_UP)) >= MAX_PRICE:
+        errors.append({"loc": ["price"], "msg": f"Must be less than {MAX_PRICE}"})
+    return (None, errors) if errors else (row, None)
+
+
+async def upsert_chunk(db, chunk: list) -> tuple:
+    """
+    Upsert (index, row) pairs in one transaction, with an outbox event per
+    inserted or changed product. Returns a result per pair and the ids of
+    the updated products; when a SKU appears more than once the last item
+    wins and earlier ones are reported as superseded.
+    """
+    deduped = unique_rows([row for _, row in chunk])
+    products_table = Product.__table__
+    written = (await db.execute(
+        upsert_statement(deduped).returning(products_table.c.id, products_table.c.sku, UPSERT_INSERTED)
+    )).all()
+    outcomes = {sku: (product_id, "inserted" if inserted else "updated") for product_id, sku, inserted in written}
+
+    unchanged = [row["sku"] for row in deduped if row["sku"] not in outcomes]
+    if unchanged:
+        for product_id, sku in (await db.execute(
+            select(Product.id, Product.sku).where(Product.sku.in_(unchanged))
+        )).all():
+            outcomes[sku] = (product_id, "unchanged")
+
+    events = []
+    for row in deduped:
+        product_id, status = outcomes[row["sku"]]
+        if status != "unchanged":
+            events.append(("product.created" if status == "inserted" else "product.updated", {
+                "product_id": product_id,
+                "sku": row["sku"],
+                "name": row["name"],
+                "price": str(row["price"])
+            }))
+    if events:
+        await db.execute(insert_events(events))
+    await db.commit()
+
+    last_index = {row["sku"]: index for index, row in chunk}
+    results = []
+    for index, row in chunk:
+        product_id, status = outcomes[row["sku"]]
+        if last_index[row["sku"]] != index:
+            status = "superseded"
+        results.append({"index": index, "sku": row["sku"], "id": product_id, "status": status})
+    updated_ids = [product_id for product_id, status in outcomes.values() if status == "updated"]
+    return results, updated_ids
+
+
+async def batch_upsert(db, stream) -> dict:
+    """
+    Upsert the products of a streamed request body. Returns counts per
+    status (items with status "error" count as failed) and a result per
+    item, in body order. A malformed JSON array
+    stops reading; the valid items before it are still written, and the
+    problem is reported as "error".
+    """
+    results = []
+    chunk = []
+    error = None
+
+    async def flush(chunk):
+        try:
+            chunk_results, updated_ids = await upsert_chunk(db, chunk)
+        except Exception as exc:
+            await db.rollback()
+            print(f"Error during batch upsert: {str(exc)}")
+            results.extend(
+                {"index": index, "sku": row["sku"], "status": "error", "errors": [{"msg": str(exc)}]}
+                for index, row in chunk
+            )
+            return
+        results.extend(chunk_results)
+        # Outside the try: the chunk is committed whatever happens here
+        await invalidate_products_async(updated_ids)
+
+    index = 0
+    try:
+        async for item in iter_items(stream):
+            row, errors = validate_item(item)
+            if errors:
+                results.append({"index": index, "status": "error", "errors": errors})
+            else:
+                chunk.append((index, row))
+                if len(chunk) >= BATCH_UPSERT_CHUNK:
+                    await flush(chunk)
+                    chunk = []
+            index += 1
+    except ValueError as exc:
+        error = str(exc)
+    if chunk:
+        await flush(chunk)
+
+    results.sort(key=lambda result: result["index"])
+    counts = {status: 0 for status in ("inserted", "updated", "unchanged", "superseded", "error")}
+    for result in results:
+        counts[result["status"]] += 1
+    counts["failed"] = counts.pop("error")
+    response = {"processed": len(results), **counts, "results": results}
+    if error:
+        response["error"] = error
+    return response
@@ -0,0 +1,94 @@
+"""
+Set-based bulk updates for POST /products/bulk-update.
+
+A bulk update selects products by the filters of GET /products and/or
+explicit ids or SKUs, and applies one patch to all of them (set active, set
+a price, or multiply prices) with a single UPDATE. Rows the patch wouldn't
+change are left alone, so they produce no dead tuples and no events. Up to
+BULK_UPDATE_INLINE_MAX products are updated inside the request; larger sets
+are updated by bulk_update_task in id-ordered batches of
+BULK_UPDATE_BATCH_SIZE, each in its own transaction.
+"""
+import os
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import DBAPIError
+
+from app.models.product import Product, MAX_PRICE
+from app.product_changes import CURRENT_XID
+from app.product_queries import apply_product_filters
+
+BULK_UPDATE_INLINE_MAX = int(os.getenv("BULK_UPDATE_INLINE_MAX", "10000"))
+BULK_UPDATE_BATCH_SIZE = int(os.getenv("BULK_UPDATE_BATCH_SIZE", "5000"))
+
+
+def matching_ids(search: str = None, active: str = None, ids: list = None, skus: list = None):
+    """select(Product.id) of the products matching all the given selectors"""
+    query = apply_product_filters(select(Product.id), search, active)
+    if ids is not None:
+        query = query.filter(Product.id.in_(ids))
+    if skus is not None:
+        query = query.filter(Product.sku.in_([sku.strip().lower() for sku in skus]))
+    return query
+
+
+def patch_values(patch: dict) -> dict:
+    """Column values (literals or SQL expressions) of a ProductPatch dict"""
+    values = {}
+    if patch.get("active") is not None:
+        values["active"] = patch["active"]
+    if patch.get("price") is not None:
+        values["price"] = Decimal(str(patch["price"]))
+    elif patch.get("price_multiplier") is not None:
+        values["price"] = func.round(Product.price * Decimal(str(patch["price_multiplier"])), 2)
+    return values
+
+
+def highest_price(id_query):
+    """select of the highest price among the products selected by id_query"""
+    return select(func.max(Product.price)).where(Product.id.in_(id_query.scalar_subquery()))
+
+
+def price_overflows(highest, patch: dict) -> bool:
+    """Whether patch's price_multiplier would put a price of highest out of the price column's range"""
+    if highest is None or patch.get("price_multiplier") is None:
+        return False
+    price = (highest * Decimal(str(patch["price_multiplier"]))).quantize(Decimal("0.01"), ROUND_HALF_UP)
+    return price >= MAX_PRICE
+
+
+def is_invalid_value(exc: DBAPIError) -> bool:
+    """Whether a failed UPDATE was rejected for a value, e.g. a price out of range (SQLSTATE class 22)"""
+    return (getattr(exc.orig, "pgcode", None) or "").startswith("22")
+
+
+def update_statement(id_query, patch: dict):
+    """
+    UPDATE applying patch to the products selected by id_query that it
+    would change, returning what their product.updated events need
+    """
+    values = patch_values(patch)
+    changed = or_(*(
+        Product.__table__.c[column].is_distinct_from(value) for column, value in values.items()
+    ))
+    return (
+        update(Product)
+        .where(Product.id.in_(id_query.filter(changed).scalar_subquery()))
+        .values(**values, change_xid=CURRENT_XID)
+        .returning(Product.id, Product.sku, Product.name, Product.price)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def updated_events(rows: list) -> list:
+    """product.updated outbox events for the rows returned by update_statement"""
+    return [
+        ("product.updated", {
+            "product_id": row.id,
+            "sku": row.sku,
+            "name": row.name,
+            "price": str(row.price)
+        })
+        for row in rows
+    ]
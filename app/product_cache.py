@@ -0,0 +1,232 @@
+"""
+Caches for product reads.
+
+Listing totals: every write to products bumps a generation counter in
+Redis. Cached counts are keyed by that generation, so a single INCR makes
+every cached count stale at once, without tracking which filter sets a
+write touched. Stale entries simply expire through their TTL.
+
+Read cache: GET /products/{id} responses are cached per product and
+deleted by the writes that change that product. A response is only cached
+if the generation hasn't moved since before the row was read, so a read
+that raced a write can't put the old row back after the write deleted
+it. Listing pages are cached
+under the same generation as the counts. Hits and misses are counted in
+the CACHE_STATS_KEY hash.
+
+The API reads through async_redis_client. Celery tasks invalidate with the
+sync invalidate_products, the API with invalidate_products_async.
+
+LRUCache is a small in-process cache for hot, cheap-to-be-stale lookups
+such as SKU autocomplete.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, select, text
+
+from app.progress import redis_client, async_redis_client
+
+GENERATION_KEY = "products:generation"
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "300"))
+# Unfiltered listings use the planner's row estimate above this many rows
+COUNT_ESTIMATE_MIN_ROWS = int(os.getenv("COUNT_ESTIMATE_MIN_ROWS", "100000"))
+
+ITEM_KEY_PREFIX = "products:item:"
+ITEM_CACHE_TTL = int(os.getenv("ITEM_CACHE_TTL", "300"))
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "60"))
+CACHE_STATS_KEY = "products:cache:stats"
+# Keys unlinked per call when every cached product is dropped
+UNLINK_BATCH = 1000
+
+
+async def products_generation() -> int:
+    return int(await async_redis_client.get(GENERATION_KEY) or 0)
+
+
+def _item_keys(product_ids) -> list:
+    return [f"{ITEM_KEY_PREFIX}{product_id}" for product_id in product_ids]
+
+
+def invalidate_products(product_ids=(), all_items: bool = False):
+    """
+    Call after any committed write to the products table, with the ids of
+    the products it changed or deleted (all_items when it can't list them)
+    """
+    pipe = redis_client.pipeline()
+    pipe.incr(GENERATION_KEY)
+    if product_ids:
+        pipe.delete(*_item_keys(product_ids))
+    pipe.execute()
+    if all_items:
+        keys = []
+        for key in redis_client.scan_iter(match=f"{ITEM_KEY_PREFIX}*", count=UNLINK_BATCH):
+            keys.append(key)
+            if len(keys) >= UNLINK_BATCH:
+                redis_client.unlink(*keys)
+                keys = []
+        if keys:
+            redis_client.unlink(*keys)
+
+
+async def invalidate_products_async(product_ids=(), all_items: bool = False):
+    """invalidate_products for the async API routes"""
+    pipe = async_redis_client.pipeline()
+    pipe.incr(GENERATION_KEY)
+    if product_ids:
+        pipe.delete(*_item_keys(product_ids))
+    await pipe.execute()
+    if all_items:
+        keys = []
+        async for key in async_redis_client.scan_iter(match=f"{ITEM_KEY_PREFIX}*", count=UNLINK_BATCH):
+            keys.append(key)
+            if len(keys) >= UNLINK_BATCH:
+                await async_redis_client.unlink(*keys)
+                keys = []
+        if keys:
+            await async_redis_client.unlink(*keys)
+
+
+def listing_filters(search=None, active=None) -> dict:
+    """Canonical form of the listing filters, empty when nothing is filtered"""
+    filters = {}
+    if search:
+        filters["search"] = search.lower()
+    if active and active != "all":
+        filters["active"] = active.lower() == "true"
+    return filters
+
+
+def _digest(params: dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def _count_key(generation: int, filters: dict) -> str:
+    return f"products:count:{generation}:{_digest(filters)}"
+
+
+async def _estimated_rows(db) -> int:
+    # reltuples is maintained by VACUUM/ANALYZE; -1 means never analyzed
+    estimate = await db.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'products'::regclass")
+    )
+    return estimate or 0
+
+
+async def count_products(db, query, filters: dict) -> tuple:
+    """
+    Return (total, exact) for a product listing select().
+
+    Large unfiltered listings get the planner's estimate. Everything else
+    gets an exact count, cached per filter set until the next write.
+    """
+    if not filters:
+        estimate = await _estimated_rows(db)
+        if estimate >= COUNT_ESTIMATE_MIN_ROWS:
+            return estimate, False
+
+    # Read the generation before counting: a write landing in between then
+    # leaves the result under an already stale key instead of a current one
+    key = _count_key(await products_generation(), filters)
+    cached = await async_redis_client.get(key)
+    if cached is not None:
+        return int(cached), True
+
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    await async_redis_client.set(key, total, ex=COUNT_CACHE_TTL)
+    return total, True
+
+
+async def _record(kind: str, hit: bool):
+    await async_redis_client.hincrby(CACHE_STATS_KEY, f"{kind}_{'hit' if hit else 'miss'}", 1)
+
+
+async def get_cached_product(product_id: int):
+    """Cached JSON body of GET /products/{id}, or None"""
+    body = await async_redis_client.get(f"{ITEM_KEY_PREFIX}{product_id}")
+    await _record("item", body is not None)
+    return body
+
+
+CACHE_ITEM_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+_cache_item = async_redis_client.register_script(CACHE_ITEM_SCRIPT)
+
+
+async def cache_product(product_id: int, payload: dict, generation: int):
+    """
+    Cache a GET /products/{id} body read at generation (products_generation()
+    taken before the read); skipped when a write has happened since
+    """
+    await _cache_item(
+        keys=[GENERATION_KEY, f"{ITEM_KEY_PREFIX}{product_id}"],
+        args=[generation, json.dumps(payload), ITEM_CACHE_TTL]
+    )
+
+
+async def page_key(params: dict) -> str:
+    """
+    Cache key of a listing page: its filters and position (page/limit or
+    cursor/sort), under the current generation so any write retires it
+    """
+    return f"products:page:{await products_generation()}:{_digest(params)}"
+
+
+async def get_cached_page(key: str):
+    """Cached JSON body of a GET /products page, or None"""
+    body = await async_redis_client.get(key)
+    await _record("page", body is not None)
+    return body
+
+
+async def cache_page(key: str, payload: dict):
+    await async_redis_client.set(key, json.dumps(payload), ex=PAGE_CACHE_TTL)
+
+
+async def cache_stats() -> dict:
+    stats = {
+        field.decode() if isinstance(field, bytes) else field: int(value)
+        for field, value in (await async_redis_client.hgetall(CACHE_STATS_KEY)).items()
+    }
+    for kind in ("item", "page"):
+        hits, misses = stats.get(f"{kind}_hit", 0), stats.get(f"{kind}_miss", 0)
+        stats[f"{kind}_hit_ratio"] = round(hits / (hits + misses), 4) if hits + misses else None
+    return stats
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,125 @@
+"""
+Change feed for GET /products/changes.
+
+Every write to a product stamps its change_xid with the id of the writing
+transaction (CURRENT_XID), and every delete leaves a ProductTombstone
+stamped the same way, so the changes since a cursor are an index range
+scan on (change_xid, id) of two tables instead of a full read.
+
+Transaction ids rather than a sequence: a sequence value is taken when a
+row is written but only becomes visible at commit, so a consumer could
+move past a value whose transaction commits later and miss that change
+for good. The feed only returns changes of transactions older than the
+oldest one still running (the xmin of the current snapshot), so nothing
+can appear behind a cursor it has handed out. The flip side is that a
+long-running transaction anywhere on the server holds the feed back until
+it ends.
+"""
+import base64
+import json
+
+from sqlalchemy import exists, insert, literal_column, select, text, tuple_
+
+from app.models.product import Product, CURRENT_XID_SQL
+from app.models.product_tombstone import ProductTombstone
+
+CURRENT_XID = literal_column(CURRENT_XID_SQL)
+
+# Position of an entry in the feed: products sort before the tombstones of
+# the same transaction
+PRODUCT, TOMBSTONE = 0, 1
+MAX_PRODUCT_ID = 2 ** 31 - 1
+
+HORIZON_SQL = text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+
+def add_tombstone(db, product: Product):
+    """Record the delete of product in the session's transaction"""
+    db.add(ProductTombstone(product_id=product.id, sku=product.sku))
+
+
+def insert_tombstones(rows: list):
+    """INSERT of tombstones for deleted rows with id and sku, for many at once"""
+    return insert(ProductTombstone).values([{"product_id": row.id, "sku": row.sku} for row in rows])
+
+
+def insert_reset_marker():
+    """INSERT of the marker of a truncated table"""
+    return insert(ProductTombstone).values(product_id=None, sku=None)
+
+
+def encode_change_cursor(position: tuple) -> str:
+    raw = json.dumps({"c": list(position)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> tuple:
+    """Return the (change_xid, kind, id) of a cursor, raising ValueError when it is invalid"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        xid, kind, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["c"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(value, int) for value in (xid, kind, row_id)) or kind not in (PRODUCT, TOMBSTONE):
+        raise ValueError("Invalid cursor")
+    return xid, kind, row_id
+
+
+async def changes_page(db, since: str = None, limit: int = 500) -> dict:
+    """
+    Up to limit changes after the since cursor (from the start without
+    one), oldest first: the current state of each product written since,
+    and the deletes. Returns the changes, next_cursor to pass as since
+    next time (since itself when nothing changed) and has_more. When the
+    table was truncated after since, returns reset instead, and the
+    consumer has to drop its copy and start again without a cursor.
+    """
+    position = decode_change_cursor(since) if since else (-1, TOMBSTONE, 0)
+    xid, kind, row_id = position
+    horizon = await db.scalar(HORIZON_SQL)
+    tombstones_after = (
+        ProductTombstone.change_xid < horizon,
+        tuple_(ProductTombstone.change_xid, ProductTombstone.id) > tuple_(xid, row_id if kind == TOMBSTONE else 0),
+    )
+
+    if since and await db.scalar(select(exists().where(
+        ProductTombstone.product_id.is_(None), *tombstones_after
+    ))):
+        return {"reset": True, "changes": [], "next_cursor": None, "has_more": False}
+
+    products = (await db.scalars(
+        select(Product)
+        .where(
+            Product.change_xid < horizon,
+            tuple_(Product.change_xid, Product.id) > tuple_(xid, row_id if kind == PRODUCT else MAX_PRODUCT_ID)
+        )
+        .order_by(Product.change_xid, Product.id)
+        .limit(limit + 1)
+    )).all()
+    tombstones = (await db.scalars(
+        select(ProductTombstone)
+        .where(ProductTombstone.product_id.isnot(None), *tombstones_after)
+        .order_by(ProductTombstone.change_xid, ProductTombstone.id)
+        .limit(limit + 1)
+    )).all()
+
+    entries = sorted(
+        [((p.change_xid, PRODUCT, p.id), {
+            "op": "upsert",
+            "id": p.id,
+            "sku": p.sku,
+            "name": p.name,
+            "description": p.description,
+            "price": str(p.price),
+            "active": p.active,
+        }) for p in products] +
+        [((t.change_xid, TOMBSTONE, t.id), {"op": "delete", "id": t.product_id, "sku": t.sku}) for t in tombstones],
+        key=lambda entry: entry[0]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return {
+        "changes": [change for _, change in entries],
+        "next_cursor": encode_change_cursor(entries[-1][0]) if entries else since,
+        "has_more": has_more,
+    }
@@ -0,0 +1,145 @@
+"""
+Query helpers shared by the product endpoints: the search/active filters,
+search relevance ordering, SKU prefix suggestions and keyset (cursor)
+pagination.
+
+Substring search uses ILIKE on sku, name and description, which the pg_trgm
+GIN indexes from migration c3f1a9d2e4b6 serve (a bitmap OR of three index
+scans instead of a sequential scan of products).
+"""
+import base64
+import json
+from typing import Optional
+
+from sqlalchemy import func, select, text, tuple_
+
+from app.models.product import Product
+
+# Keyset orderings: the columns a cursor is keyed on, all unique together
+CURSOR_KEYS = {
+    "id": (Product.id,),
+    "sku": (Product.sku, Product.id),
+}
+
+
+def apply_product_filters(query, search: Optional[str] = None, active: Optional[str] = None):
+    """Apply the search and active filters of GET /products to a select()"""
+    if search:
+        search_term = f"%{search}%"
+        query = query.filter(
+            Product.sku.ilike(search_term) |
+            Product.name.ilike(search_term) |
+            Product.description.ilike(search_term)
+        )
+
+    if active and active != "all":
+        is_active = active.lower() == "true"
+        query = query.filter(Product.active == is_active)
+
+    return query
+
+
+def search_rank(search: str):
+    """
+    pg_trgm relevance of a product for a search term: the best of the SKU and
+    name similarity and the word similarity of the term within the description
+    """
+    return func.greatest(
+        func.similarity(Product.sku, search),
+        func.similarity(Product.name, search),
+        func.word_similarity(search, func.coalesce(Product.description, "")),
+    )
+
+
+def order_by_relevance(query, search: str):
+    return query.order_by(search_rank(search).desc(), Product.id)
+
+
+async def suggest_skus(db, prefix: str, limit: int) -> list:
+    """
+    SKUs starting with prefix, in byte order.
+
+    LIKE 'prefix%' becomes a range scan on ix_unique_sku_lower
+    (varchar_pattern_ops), ordering with the same ~<~ operator class lets
+    the index return rows already sorted, and selecting only sku makes it
+    an index-only scan.
+    """
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    skus = await db.scalars(
+        select(Product.sku)
+        .filter(Product.sku.like(f"{escaped}%"))
+        .order_by(text("sku USING ~<~"))
+        .limit(limit)
+    )
+    return skus.all()
+
+
+def encode_cursor(sort: str, direction: str, product: Product) -> str:
+    """Opaque cursor pointing just past (direction "next") or before ("prev") a product"""
+    keys = [getattr(product, column.key) for column in CURSOR_KEYS[sort]]
+    raw = json.dumps({"s": sort, "d": direction, "k": keys}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Return (direction, keys) of a cursor, raising ValueError when it is invalid"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, keys = data["d"], data["k"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if data.get("s") != sort or direction not in ("next", "prev"):
+        raise ValueError("Cursor does not match this listing")
+    # Each key must be a value of its column: anything else would fail the
+    # query instead of the request
+    columns = CURSOR_KEYS[sort]
+    if not isinstance(keys, list) or len(keys) != len(columns) or not all(
+        type(key) is column.type.python_type and (type(key) is not int or -2 ** 31 <= key < 2 ** 31)
+        for key, column in zip(keys, columns)
+    ):
+        raise ValueError("Invalid cursor")
+    return direction, keys
+
+
+async def keyset_page(db, query, sort: str, limit: int, cursor: Optional[str] = None) -> dict:
+    """
+    Fetch one page of a select() in keyset order.
+
+    Instead of OFFSET, the page starts right after (or before) the key of
+    the row the cursor points at, which an index on the key columns serves
+    directly however deep the page is. Returns the products and the
+    cursors of the neighbouring pages (None at either end).
+    """
+    columns = CURSOR_KEYS[sort]
+    key = tuple_(*columns)
+    direction, keys = decode_cursor(cursor, sort) if cursor else ("next", None)
+
+    if direction == "next":
+        if keys is not None:
+            query = query.filter(key > tuple_(*keys))
+        query = query.order_by(*(column.asc() for column in columns))
+    else:
+        query = query.filter(key < tuple_(*keys))
+        query = query.order_by(*(column.desc() for column in columns))
+
+    # One extra row tells whether there is another page in this direction
+    products = (await db.scalars(query.limit(limit + 1))).all()
+    has_more = len(products) > limit
+    products = products[:limit]
+    if direction == "prev":
+        products.reverse()
+
+    if not products:
+        return {"products": [], "next_cursor": None, "prev_cursor": None}
+
+    if direction == "next":
+        has_next, has_prev = has_more, keys is not None
+    else:
+        has_next, has_prev = True, has_more
+
+    return {
+        "products": products,
+        "next_cursor": encode_cursor(sort, "next", products[-1]) if has_next else None,
+        "prev_cursor": encode_cursor(sort, "prev", products[0]) if has_prev else None,
+    }
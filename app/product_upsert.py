@@ -0,0 +1,55 @@
+"""
+INSERT ... ON CONFLICT (sku) upserts of product rows, shared by CSV imports
+(app/tasks.py) and POST /products/batch (app/product_batch.py).
+"""
+from sqlalchemy import literal_column, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.product import Product
+from app.product_changes import CURRENT_XID
+
+# RETURNING expression telling inserted rows (no previous row version) from
+# updated ones. Rows skipped by the conflict WHERE clause are not returned.
+UPSERT_INSERTED = literal_column("(xmax = 0)").label("inserted")
+
+
+def unique_rows(rows: list) -> list:
+    """
+    Rows deduplicated by SKU, keeping the last occurrence of each, in SKU
+    order: concurrent upserts touching the same SKUs (e.g. parallel shards)
+    then always take row locks in the same order and cannot deadlock
+    """
+    seen_skus = {}
+    for row in rows:
+        sku = row['sku']
+        if sku:  # Only process non-empty SKUs
+            seen_skus[sku] = row
+    return [seen_skus[sku] for sku in sorted(seen_skus)]
+
+
+def upsert_statement(rows: list, skip_unchanged: bool = True):
+    """
+    INSERT ... ON CONFLICT (sku) DO UPDATE of rows from unique_rows(). With
+    skip_unchanged, conflicting rows are only rewritten when their content
+    differs, so re-imports don't produce dead tuples and WAL for unchanged
+    products. Add .returning() as needed.
+    """
+    products_table = Product.__table__
+    insert_stmt = pg_insert(products_table).values(rows)
+    update_cols = {
+        "name": insert_stmt.excluded.name,
+        "description": insert_stmt.excluded.description,
+        "price": insert_stmt.excluded.price,
+        "active": insert_stmt.excluded.active,
+    }
+    changed = None
+    if skip_unchanged:
+        changed = or_(*(
+            products_table.c[column].is_distinct_from(value)
+            for column, value in update_cols.items()
+        ))
+    return insert_stmt.on_conflict_do_update(
+        index_elements=["sku"], 
+        set_={**update_cols, "change_xid": CURRENT_XID},
+        where=changed
+    )
@@ -1,11 +1,61 @@
 import os
 import json
 import redis
+import redis.asyncio
 import ssl
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 redis_client = redis.Redis.from_url(REDIS_URL, ssl_cert_reqs=ssl.CERT_NONE)
+# Used by the async API routes so Redis round-trips don't block the event loop
+async_redis_client = redis.asyncio.Redis.from_url(REDIS_URL, ssl_cert_reqs=ssl.CERT_NONE)
+
+# The latest message of a job is kept, for clients subscribing after it was sent
+PROGRESS_STATE_TTL = 24 * 3600
+
+def progress_state_key(job_id: str) -> str:
+    return f"progress:{job_id}:last"
 
 def publish_progress(job_id: str, payload: dict):
     channel = f"progress:{job_id}"
-    redis_client.publish(channel, json.dumps(payload))
+    message = json.dumps(payload)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.set(progress_state_key(job_id), message, ex=PROGRESS_STATE_TTL)
+    pipe.publish(channel, message)
+    pipe.execute()
+
+def update_shard_progress(job_id: str, shard: int, processed: int, consumed: int) -> tuple:
+    """
+    Record the progress of one shard of a parallel import and return the
+    (processed rows, consumed bytes) summed over every shard reported so far
+    """
+    key = f"import:{job_id}:shards"
+    pipe = redis_client.pipeline()
+    pipe.hset(key, str(shard), json.dumps({"processed": processed, "consumed": consumed}))
+    pipe.expire(key, 24 * 3600)
+    pipe.hvals(key)
+    shard_states = [json.loads(value) for value in pipe.execute()[-1]]
+    return (
+        sum(state["processed"] for state in shard_states),
+        sum(state["consumed"] for state in shard_states),
+    )
+
+def clear_shard_progress(job_id: str):
+    redis_client.delete(f"import:{job_id}:shards")
+
+# Import checkpoints: the byte offset and row counters reached by each part of
+# an import ("main", or the shard number), saved after every committed batch
+CHECKPOINT_TTL = 24 * 3600
+
+def save_checkpoint(job_id: str, part, offset: int, counts: dict):
+    key = f"import:{job_id}:checkpoint"
+    pipe = redis_client.pipeline()
+    pipe.hset(key, str(part), json.dumps({"offset": offset, **counts}))
+    pipe.expire(key, CHECKPOINT_TTL)
+    pipe.execute()
+
+def load_checkpoint(job_id: str, part):
+    value = redis_client.hget(f"import:{job_id}:checkpoint", str(part))
+    return json.loads(value) if value else None
+
+def clear_checkpoints(job_id: str):
+    redis_client.delete(f"import:{job_id}:checkpoint")
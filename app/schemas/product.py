@@ -1,6 +1,7 @@
 # app/schemas/product.py
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.models.product import MAX_PRICE
 
 class ProductCreate(BaseModel):
     sku: str
@@ -16,6 +17,22 @@ class ProductUpdate(BaseModel):
     price: Optional[float] = None
     active: Optional[bool] = None
 
+class ProductPatch(BaseModel):
+    # Set either price or price_multiplier (e.g. 1.05 for +5%), not both.
+    # Whether a multiplied price still fits is checked against the products.
+    active: Optional[bool] = None
+    price: Optional[float] = Field(None, ge=0, lt=float(MAX_PRICE))
+    price_multiplier: Optional[float] = Field(None, gt=0, lt=float(MAX_PRICE))
+
+class ProductBulkUpdate(BaseModel):
+    # Products matching all given selectors: the filters of GET /products,
+    # and/or explicit ids or SKUs. None at all selects every product.
+    search: Optional[str] = None
+    active: Optional[str] = None
+    ids: Optional[List[int]] = None
+    skus: Optional[List[str]] = None
+    patch: ProductPatch
+
 class ProductResponse(BaseModel):
     id: int
     sku: str
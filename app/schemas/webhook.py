@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl, validator
+from pydantic import BaseModel, Field, HttpUrl, validator
 from typing import Optional
 from datetime import datetime
 
@@ -9,6 +9,10 @@ class WebhookBase(BaseModel):
     enabled: bool = True
     secret: Optional[str] = None
     headers: Optional[str] = None  # JSON string
+    # Batching: deliver buffered events as one array after this many seconds
+    # or events, whichever comes first. Off when both are unset.
+    batch_window_seconds: Optional[int] = Field(None, ge=1, le=3600)
+    batch_max_events: Optional[int] = Field(None, ge=1, le=10000)
 
     @validator('event_type')
     def validate_event_type(cls, v):
@@ -27,6 +31,8 @@ class WebhookUpdate(BaseModel):
     enabled: Optional[bool] = None
     secret: Optional[str] = None
     headers: Optional[str] = None
+    batch_window_seconds: Optional[int] = Field(None, ge=1, le=3600)
+    batch_max_events: Optional[int] = Field(None, ge=1, le=10000)
 
     @validator('event_type')
     def validate_event_type(cls, v):
@@ -43,9 +49,13 @@ class WebhookResponse(WebhookBase):
     last_triggered_at: Optional[datetime] = None
     success_count: int
     failure_count: int
+    # Circuit breaker: closed, open (deliveries deferred until breaker_open_until) or half_open
+    breaker_state: str = "closed"
+    breaker_open_until: Optional[datetime] = None
+    avg_latency_ms: Optional[float] = None
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class WebhookTestResponse(BaseModel):
     success: bool
@@ -1,137 +1,800 @@
-import csv
 import os
 import io
+import time
 from decimal import Decimal
+from celery import chord
 from app.celery_app import celery
 from app.database import SessionLocal, engine
-from app.models.product import Product, Base
-from app.progress import publish_progress
+from app.models.product import Product, Base, CURRENT_XID_SQL
+from app.models.import_seen_sku import ImportSeenSku
+from app.progress import (
+    publish_progress, update_shard_progress, clear_shard_progress,
+    save_checkpoint, load_checkpoint, clear_checkpoints,
+)
+from app.csv_source import CsvSource, find_shard_ranges, parse_active
+from app.dedupe import dedupe_csv
+from app.arrow_source import ArrowCsvSource, normalize_batch
+from app.product_cache import invalidate_products
+from app.product_queries import apply_product_filters
+from app.outbox import add_event, insert_events
+from app.job_checkpoints import save_job_checkpoint, load_job_checkpoint, prune_job_checkpoints
+from app.product_changes import insert_tombstones, insert_reset_marker
+from app.product_upsert import UPSERT_INSERTED, unique_rows, upsert_statement
+from app.product_bulk import matching_ids, update_statement, updated_events, is_invalid_value, BULK_UPDATE_BATCH_SIZE
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
 
 BATCH_SIZE = 1000
 
+# Ingest engines: "upsert" batches rows into pg_insert(...).on_conflict_do_update,
+# "copy" streams them into a staging table with COPY and merges set-based
+INGEST_ENGINES = ("upsert", "copy")
+INGEST_ENGINE = os.getenv("INGEST_ENGINE", "upsert")
+COPY_BATCH_SIZE = int(os.getenv("COPY_BATCH_SIZE", "50000"))
+
+# Parallel imports: files of at least SHARD_MIN_BYTES are split into this many
+# byte-range shards, each imported by its own Celery subtask
+IMPORT_SHARDS = int(os.getenv("IMPORT_SHARDS", "1"))
+SHARD_MIN_BYTES = int(os.getenv("SHARD_MIN_BYTES", str(8 * 1024 * 1024)))
+
+# Change detection: only rewrite existing products whose content differs
+IMPORT_SKIP_UNCHANGED = os.getenv("IMPORT_SKIP_UNCHANGED", "true").lower() == "true"
+IMPORT_COUNTERS = ("processed", "inserted", "updated", "unchanged")
+
+# Whole-file SKU deduplication before the import (see app/dedupe.py)
+IMPORT_DEDUPE = os.getenv("IMPORT_DEDUPE", "false").lower() == "true"
+
+# CSV parsers: "csv" normalizes row by row, "arrow" reads columnar record
+# batches with pyarrow and normalizes them vectorized (see app/arrow_source.py)
+CSV_PARSERS = ("csv", "arrow")
+CSV_PARSER = os.getenv("CSV_PARSER", "csv")
+
+# Sync imports: products missing from the file are deactivated or deleted
+SYNC_MODES = ("deactivate", "delete")
+
+# Filtered bulk deletes remove this many rows per transaction, in id order
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "5000"))
+
+
+def _retry_or_fail(task, job_id: str, exc: Exception, message: str = None):
+    """
+    Report a failed attempt of a job task and return its retry to raise.
+    "error" is final for clients, so it is only sent once retries run out;
+    before that the job is "retrying".
+    """
+    message = message or str(exc)
+    attempt = task.request.retries + 1
+    if task.request.retries >= task.max_retries:
+        publish_progress(job_id, {"status": "error", "message": message, "attempt": attempt})
+    else:
+        publish_progress(job_id, {
+            "status": "retrying",
+            "message": f"Attempt {attempt} of {task.max_retries + 1} failed, retrying: {message}",
+            "attempt": attempt
+        })
+    return task.retry(exc=exc)
+
 
 @celery.task(bind=True, max_retries=3, default_retry_delay=10)
-def process_csv_task(self, job_id: str, filepath: str):
+def process_csv_task(
+    self,
+    job_id: str,
+    filepath: str,
+    ingest_engine: str = None,
+    shards: int = None,
+    skip_unchanged: bool = None,
+    dedupe: bool = None,
+    parser: str = None,
+    sync: str = None
+):
+    options = {
+        "parser": parser or CSV_PARSER,
+        "ingest_engine": ingest_engine or INGEST_ENGINE,
+        "skip_unchanged": IMPORT_SKIP_UNCHANGED if skip_unchanged is None else skip_unchanged,
+        "dedupe": IMPORT_DEDUPE if dedupe is None else dedupe,
+        "sync": sync,
+    }
+    if options["ingest_engine"] not in INGEST_ENGINES:
+        publish_progress(job_id, {"status": "error", "message": f"Unknown ingest engine '{options['ingest_engine']}'"})
+        return
+    if options["parser"] not in CSV_PARSERS:
+        publish_progress(job_id, {"status": "error", "message": f"Unknown CSV parser '{options['parser']}'"})
+        return
+    if sync and sync not in SYNC_MODES:
+        publish_progress(job_id, {"status": "error", "message": f"Unknown sync mode '{sync}'"})
+        return
+    shards = shards or IMPORT_SHARDS
+
     try:
-        # Count total lines first
-        with open(filepath, "r", encoding="utf-8") as fh:
-            total_lines = sum(1 for _ in fh) - 1  # Subtract header
-        
-        if total_lines <= 0:
-            publish_progress(job_id, {"status": "error", "message": "Empty CSV file"})
-            return
-        
-        processed_lines = 0
-        rows_buffer = []
+        started_at = time.time()
 
         # Ensure tables exist
         Base.metadata.create_all(bind=engine)
 
-        with open(filepath, "r", newline='', encoding="utf-8") as fh:
-            reader = csv.DictReader(fh)
-            
-            for row in reader:
-                # Normalizing and validating row fields
-                sku = (row.get("sku") or "").strip().lower()
-                name = (row.get("name") or "").strip()
-                description = (row.get("description") or "").strip()
-                price_raw = (row.get("price") or "0").strip()
-                if not sku:
-                    processed_lines += 1
-                    continue
-                try:
-                    price = Decimal(price_raw)
-                except Exception:
-                    price = Decimal("0.00")
-
-                rows_buffer.append({
-                    "sku": sku,
-                    "name": name,
-                    "description": description,
-                    "price": price,
-                    "active": True
+        if options["dedupe"]:
+            filepath = _dedupe_upload(job_id, filepath, options)
+
+        if shards > 1 and os.path.getsize(filepath) >= SHARD_MIN_BYTES:
+            ranges = find_shard_ranges(filepath, shards)
+            if len(ranges) > 1:
+                publish_progress(job_id, {
+                    "status": "processing",
+                    "processed": 0,
+                    "total": CsvSource(filepath).sample_total(),
+                    "percent": 0,
+                    "shards": len(ranges)
+                })
+                chord(
+                    process_csv_shard_task.s(job_id, filepath, shard, start, end, options)
+                    for shard, (start, end) in enumerate(ranges)
+                )(finalize_sharded_import.s(job_id, options, started_at))
+                return
+
+        def report_progress(source, counts):
+            save_checkpoint(job_id, "main", source.offset, counts)
+            publish_progress(job_id, {
+                "status": "processing",
+                "processed": counts["processed"],
+                "total": source.estimate_total(counts["processed"]),
+                "percent": source.percent
+            })
+
+        # A retry or a redelivered task picks up after the last committed batch
+        checkpoint = load_checkpoint(job_id, "main")
+        counts = _import_counts(checkpoint)
+
+        # Single pass over the file: progress comes from the bytes consumed
+        with _open_source(filepath, options, checkpoint) as source:
+            if checkpoint:
+                publish_progress(job_id, {
+                    "status": "resumed",
+                    "processed": counts["processed"],
+                    "total": source.estimate_total(counts["processed"]),
+                    "percent": source.percent,
+                    "resumed_at_offset": checkpoint["offset"],
+                    "attempt": self.request.retries
+                })
+            else:
+                publish_progress(job_id, {
+                    "status": "processing",
+                    "processed": 0,
+                    "total": source.sample_total(),
+                    "percent": 0
                 })
+            _import_rows(job_id, source, options, report_progress, counts)
 
-                processed_lines += 1
+        if counts["processed"] == 0:
+            clear_checkpoints(job_id)
+            publish_progress(job_id, {"status": "error", "message": "Empty CSV file"})
+            return
 
-                # Batch insert and report progress
-                if len(rows_buffer) >= BATCH_SIZE:
-                    _bulk_upsert(rows_buffer)
-                    rows_buffer = []
+        _complete_import(job_id, counts, options, started_at)
 
-                    percent = round((processed_lines / total_lines) * 100, 2)
-                    publish_progress(job_id, {
-                        "status": "processing",
-                        "processed": processed_lines,
-                        "total": total_lines,
-                        "percent": percent
-                    })
+    except Exception as exc:
+        raise _retry_or_fail(self, job_id, exc)
 
-            # Flush remaining rows
-            if rows_buffer:
-                _bulk_upsert(rows_buffer)
 
-        # Final completion message
-        publish_progress(job_id, {
-            "status": "complete",
-            "processed": processed_lines,
-            "total": total_lines,
-            "percent": 100
-        })
-        try:
-            from app.webhook_tasks import trigger_webhooks_for_event
-            trigger_webhooks_for_event.delay('csv.completed', {
-                "job_id": job_id,
-                "total_imported": processed_lines,
-                "timestamp": datetime.utcnow().isoformat()
+@celery.task(bind=True, max_retries=3, default_retry_delay=10)
+def process_csv_shard_task(self, job_id: str, filepath: str, shard: int, start: int, end: int, options: dict):
+    """
+    Import one byte range of an uploaded file as part of a parallel import
+    """
+    try:
+        def report_progress(source, counts):
+            save_checkpoint(job_id, shard, source.offset, counts)
+            # Publish the progress of the whole job, not just this shard
+            processed, consumed = update_shard_progress(job_id, shard, counts["processed"], source.consumed)
+            publish_progress(job_id, {
+                "status": "processing",
+                "processed": processed,
+                "total": max(processed, round(processed * source.size / consumed)) if consumed else processed,
+                "percent": round(consumed / source.size * 100, 2)
             })
-        except ImportError:
-            # Webhook tasks not available, skip
-            pass
-        
+
+        checkpoint = load_checkpoint(job_id, shard)
+        counts = _import_counts(checkpoint)
+
+        with _open_source(filepath, options, checkpoint, start, end) as source:
+            if checkpoint:
+                publish_progress(job_id, {
+                    "status": "resumed",
+                    "shard": shard,
+                    "resumed_at_offset": checkpoint["offset"],
+                    "attempt": self.request.retries
+                })
+            _import_rows(job_id, source, options, report_progress, counts)
+        return counts
+
+    except Exception as exc:
+        raise _retry_or_fail(self, job_id, exc, f"Shard {shard}: {exc}")
+
+
+@celery.task(bind=True, max_retries=3, default_retry_delay=10)
+def finalize_sharded_import(self, shard_results: list, job_id: str, options: dict, started_at: float):
+    """
+    Chord callback of a parallel import: report completion once for all shards
+    """
+    try:
+        clear_shard_progress(job_id)
+        counts = _import_counts()
+        for shard_counts in shard_results:
+            for key in IMPORT_COUNTERS:
+                counts[key] += shard_counts[key]
+        if counts["processed"] == 0:
+            clear_checkpoints(job_id)
+            publish_progress(job_id, {"status": "error", "message": "Empty CSV file"})
+            return
+        _complete_import(job_id, counts, options, started_at)
+
     except Exception as exc:
-        publish_progress(job_id, {"status": "error", "message": str(exc)})
-        raise self.retry(exc=exc)
-    
-def _bulk_upsert(rows: list):
+        raise _retry_or_fail(self, job_id, exc)
+
+
+def _dedupe_upload(job_id: str, filepath: str, options: dict) -> str:
+    """
+    Run the whole-file dedupe pre-stage and return the path to import instead.
+    A resumed import reuses the output of a finished pre-stage.
+    """
+    dedupe_path = f"{os.path.splitext(filepath)[0]}.dedup.csv"
+    done = load_checkpoint(job_id, "dedupe")
+    if not (done and os.path.exists(dedupe_path) and os.path.getsize(dedupe_path) == done["offset"]):
+        publish_progress(job_id, {"status": "processing", "stage": "dedupe", "processed": 0, "percent": 0})
+        stats = dedupe_csv(filepath, dedupe_path)
+        done = {"offset": os.path.getsize(dedupe_path), **stats}
+        save_checkpoint(job_id, "dedupe", done["offset"], stats)
+        publish_progress(job_id, {
+            "status": "processing",
+            "stage": "dedupe",
+            "processed": 0,
+            "total": stats["rows_written"],
+            "percent": 0,
+            "duplicates_collapsed": stats["duplicates_collapsed"]
+        })
+
+    options["dedupe_path"] = dedupe_path
+    options["duplicates_collapsed"] = done["duplicates_collapsed"]
+    return dedupe_path
+
+
+def _import_counts(checkpoint: dict = None) -> dict:
+    """Import counters, starting from a checkpoint when resuming"""
+    return {key: (checkpoint or {}).get(key, 0) for key in IMPORT_COUNTERS}
+
+
+def _open_source(filepath: str, options: dict, checkpoint: dict = None, start: int = None, end: int = None):
+    """Open the configured parser on a file or shard, resuming from a checkpoint"""
+    if options["parser"] == "arrow":
+        skip_rows = checkpoint["processed"] if checkpoint else 0
+        return ArrowCsvSource(filepath, start, end, skip_rows=skip_rows)
+    resume_offset = checkpoint["offset"] if checkpoint else None
+    return CsvSource(filepath, start, end, resume_offset=resume_offset)
+
+
+def _normalize_row(row: dict):
+    """Normalize and validate the fields of a CSV row, None when it has no SKU"""
+    sku = (row.get("sku") or "").strip().lower()
+    name = (row.get("name") or "").strip()
+    description = (row.get("description") or "").strip()
+    price_raw = (row.get("price") or "0").strip()
+    if not sku:
+        return None
+    try:
+        price = Decimal(price_raw)
+    except Exception:
+        price = Decimal("0.00")
+
+    return {
+        "sku": sku,
+        "name": name,
+        "description": description,
+        "price": price,
+        "active": parse_active(row.get("active"))
+    }
+
+
+def _import_rows(job_id: str, source: CsvSource, options: dict, on_batch, counts: dict):
+    """
+    Normalize the rows of a source and write them in batches with the
+    configured ingest engine, adding to counts as it goes.
+    on_batch(source, counts) is called after every batch is committed,
+    at which point counts["processed"] covers exactly the rows written.
+    A sync import also records the SKUs of every batch in import_seen_skus.
+    """
+    if options["ingest_engine"] == "copy":
+        flush_rows, batch_size = _copy_upsert, COPY_BATCH_SIZE
+    else:
+        flush_rows, batch_size = _bulk_upsert, BATCH_SIZE
+
+    def flush(rows):
+        if options.get("sync"):
+            # Before the write: a batch retried after a crash is recorded again
+            _record_seen_skus(job_id, rows)
+        written = flush_rows(rows, options["skip_unchanged"])
+        updated_ids = written.pop("updated_ids", ())
+        for key, value in written.items():
+            counts[key] += value
+        if written["inserted"] or written["updated"]:
+            invalidate_products(updated_ids)
+        on_batch(source, counts)
+
+    rows_buffer = []
+
+    if options["parser"] == "arrow":
+        # Columnar path: whole record batches are normalized at once
+        for batch in source.iter_batches(batch_size):
+            rows_buffer.extend(normalize_batch(batch))
+            counts["processed"] += batch.num_rows
+            if len(rows_buffer) >= batch_size:
+                flush(rows_buffer)
+                rows_buffer = []
+    else:
+        for row in source:
+            normalized = _normalize_row(row)
+            counts["processed"] += 1
+            if normalized is None:
+                continue
+            rows_buffer.append(normalized)
+
+            # Batch insert and report progress
+            if len(rows_buffer) >= batch_size:
+                flush(rows_buffer)
+                rows_buffer = []
+
+    # Flush remaining rows
+    if rows_buffer:
+        flush(rows_buffer)
+
+
+def _record_seen_skus(job_id: str, rows: list):
+    db = SessionLocal()
+    try:
+        # In SKU order, like the upsert, so shards sharing SKUs never deadlock
+        db.execute(
+            pg_insert(ImportSeenSku).on_conflict_do_nothing(),
+            [{"job_id": job_id, "sku": sku} for sku in sorted({row["sku"] for row in rows if row["sku"]})]
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error recording imported SKUs: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+# A file without a single valid row leaves the catalog alone instead of emptying it
+SYNC_MISSING_WHERE = """NOT EXISTS (
+    SELECT 1 FROM import_seen_skus seen WHERE seen.job_id = :job_id AND seen.sku = products.sku
+) AND EXISTS (SELECT 1 FROM import_seen_skus WHERE job_id = :job_id)"""
+SYNC_DEACTIVATE_SQL = text(f"""
+    UPDATE products SET active = false, change_xid = {CURRENT_XID_SQL}
+    WHERE active AND {SYNC_MISSING_WHERE}
+    RETURNING id, sku, name, price
+""")
+SYNC_DELETE_SQL = text(f"""
+    DELETE FROM products
+    WHERE {SYNC_MISSING_WHERE}
+    RETURNING id, sku, name
+""")
+
+
+def _sync_missing(job_id: str, mode: str) -> dict:
+    """
+    End of a sync import: deactivate or delete every product whose SKU the
+    import didn't see, with one anti-join against import_seen_skus, and
+    queue their events in the same transaction. Running it again finds
+    nothing more to do, so a retried completion is harmless.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            SYNC_DEACTIVATE_SQL if mode == "deactivate" else SYNC_DELETE_SQL,
+            {"job_id": job_id}
+        ).all()
+        if rows:
+            if mode == "deactivate":
+                events = updated_events(rows)
+            else:
+                db.execute(insert_tombstones(rows))
+                events = [("product.deleted", {
+                    "product_id": row.id, "sku": row.sku, "name": row.name
+                }) for row in rows]
+            db.execute(insert_events(events))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error syncing missing products: {str(e)}")
+        raise
+    finally:
+        db.close()
+    if rows:
+        invalidate_products([row.id for row in rows])
+    return {"deactivated" if mode == "deactivate" else "deleted": len(rows)}
+
+
+def _clear_seen_skus(job_id: str):
+    db = SessionLocal()
+    try:
+        db.execute(delete(ImportSeenSku).where(ImportSeenSku.job_id == job_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _complete_import(job_id: str, counts: dict, options: dict, started_at: float):
+    sync_counts = {}
+    if options.get("sync"):
+        sync_counts = _sync_missing(job_id, options["sync"])
+    clear_checkpoints(job_id)
+    if options.get("sync"):
+        # Only now: with the checkpoints gone, a retry re-imports the whole file
+        _clear_seen_skus(job_id)
+    if options.get("dedupe_path") and os.path.exists(options["dedupe_path"]):
+        os.remove(options["dedupe_path"])
+    elapsed = time.time() - started_at
+    processed_lines = counts["processed"]
+    summary = {
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+        "unchanged": counts["unchanged"],
+    }
+    if options.get("dedupe"):
+        summary["duplicates_collapsed"] = options["duplicates_collapsed"]
+    if options.get("sync"):
+        summary["sync"] = options["sync"]
+        summary.update(sync_counts)
+
+    # Final completion message
+    publish_progress(job_id, {
+        "status": "complete",
+        "processed": processed_lines,
+        "total": processed_lines,
+        "percent": 100,
+        **summary,
+        "ingest_engine": options["ingest_engine"],
+        "rows_per_sec": round(processed_lines / elapsed, 1) if elapsed > 0 else None
+    })
+    try:
+        from app.webhook_tasks import publish_event
+        publish_event('csv.completed', {
+            "job_id": job_id,
+            "total_imported": processed_lines,
+            **summary,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+    except ImportError:
+        # Webhook tasks not available, skip
+        pass
+
+
+def _upsert_counts(unique_count: int, written: list) -> dict:
+    """Counts from the (id, inserted) rows returned by an upsert, plus the
+    ids of updated products so their cached copies can be dropped"""
+    updated_ids = [product_id for product_id, was_inserted in written if not was_inserted]
+    return {
+        "inserted": len(written) - len(updated_ids),
+        "updated": len(updated_ids),
+        "unchanged": unique_count - len(written),
+        "updated_ids": updated_ids,
+    }
+
+
+def _bulk_upsert(rows: list, skip_unchanged: bool = True) -> dict:
     """
     Perform bulk upsert using PostgreSQL insert ... on_conflict_do_update
+    (see upsert_statement). Returns inserted/updated/unchanged counts and
+    the ids of updated products.
     """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
     if not rows:
-        return
+        return counts
 
-    # Deduplicate rows by SKU - keep the last occurrence of each SKU
-    seen_skus = {}
-    for row in rows:
-        sku = row['sku']
-        if sku:  # Only process non-empty SKUs
-            seen_skus[sku] = row
-    
-    unique_rows = list(seen_skus.values())
-    if not unique_rows:
-        return
+    deduped = unique_rows(rows)
+    if not deduped:
+        return counts
 
     db = SessionLocal()
     try:
         products_table = Product.__table__
-        insert_stmt = pg_insert(products_table).values(unique_rows)
-        update_cols = {
-            "name": insert_stmt.excluded.name,
-            "description": insert_stmt.excluded.description,
-            "price": insert_stmt.excluded.price,
-            "active": insert_stmt.excluded.active,
-        }
-        upsert_stmt = insert_stmt.on_conflict_do_update(
-            index_elements=["sku"], 
-            set_=update_cols
+        upsert_stmt = upsert_statement(deduped, skip_unchanged).returning(
+            products_table.c.id, UPSERT_INSERTED
         )
-        db.execute(upsert_stmt)
+        written = db.execute(upsert_stmt).all()
         db.commit()
+        return _upsert_counts(len(deduped), written)
     except Exception as e:
         db.rollback()
         print(f"Error during bulk upsert: {str(e)}")
         raise
     finally:
         db.close()
+
+
+STAGING_TABLE_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS products_staging (
+    seq integer NOT NULL,
+    sku varchar(100) NOT NULL,
+    name varchar(255) NOT NULL,
+    description varchar(500),
+    price numeric(10, 2) NOT NULL,
+    active boolean
+) ON COMMIT DELETE ROWS
+"""
+
+# DISTINCT ON keeps the last occurrence of each SKU in the batch, which matches
+# the deduplication done by _bulk_upsert. Rows come out in SKU order, so
+# concurrent merges lock conflicting rows in the same order.
+STAGING_MERGE_SQL = """
+INSERT INTO products (sku, name, description, price, active)
+SELECT DISTINCT ON (sku) sku, name, description, price, active
+FROM products_staging
+ORDER BY sku, seq DESC
+ON CONFLICT (sku) DO UPDATE SET
+    name = EXCLUDED.name,
+    description = EXCLUDED.description,
+    price = EXCLUDED.price,
+    active = EXCLUDED.active,
+    change_xid = {current_xid}
+{where}
+RETURNING id, (xmax = 0) AS inserted
+"""
+
+STAGING_CHANGED_WHERE = """WHERE (products.name, products.description, products.price, products.active)
+    IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.description, EXCLUDED.price, EXCLUDED.active)"""
+
+
+def _copy_text(value) -> str:
+    """Escape a value for PostgreSQL COPY text format"""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_upsert(rows: list, skip_unchanged: bool = True) -> dict:
+    """
+    Stream rows into a temporary staging table with COPY, then merge them into
+    products with one INSERT ... SELECT ... ON CONFLICT.
+    Returns inserted/updated/unchanged counts and updated ids like _bulk_upsert.
+    """
+    if not rows:
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    buffer = io.StringIO()
+    for seq, row in enumerate(rows):
+        buffer.write("\t".join((
+            str(seq),
+            _copy_text(row["sku"]),
+            _copy_text(row["name"]),
+            _copy_text(row["description"]),
+            str(row["price"]),
+            "t" if row["active"] else "f",
+        )))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(STAGING_TABLE_DDL)
+        cursor.copy_expert(
+            "COPY products_staging (seq, sku, name, description, price, active) FROM STDIN",
+            buffer
+        )
+        cursor.execute(STAGING_MERGE_SQL.format(current_xid=CURRENT_XID_SQL, where=STAGING_CHANGED_WHERE if skip_unchanged else ""))
+        written = cursor.fetchall()
+        cursor.close()
+        conn.commit()
+        return _upsert_counts(len({row["sku"] for row in rows}), written)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error during COPY upsert: {str(e)}")
+        raise
+    finally:
+        conn.close()
+
+
+@celery.task(bind=True, max_retries=3, default_retry_delay=10)
+def bulk_delete_task(self, job_id: str, search: str = None, active: str = None):
+    """
+    Delete the products matching the search/active filters of GET /products,
+    or all of them without filters, reporting progress on the job's channel.
+    The product.bulk_deleted event is committed with the last deletion.
+    """
+    # The same filters as apply_product_filters: only active="all" means "no filter"
+    filters = {}
+    if search:
+        filters["search"] = search
+    if active and active != "all":
+        filters["active"] = active
+    event = {
+        "job_id": job_id,
+        "operation": "bulk_delete",
+        **({"filters": filters} if filters else {}),
+    }
+    try:
+        if filters:
+            deleted = _delete_in_batches(job_id, search, active, event)
+        else:
+            deleted = _truncate_products(job_id, event)
+        publish_progress(job_id, {
+            "status": "complete",
+            "percent": 100,
+            "deleted_count": deleted,
+            "message": f"Successfully deleted {deleted} product(s)"
+        })
+        return {"deleted_count": deleted}
+    except Exception as exc:
+        raise _retry_or_fail(self, job_id, exc)
+
+
+def _bulk_deleted_event(db, event: dict, count: int):
+    add_event(db, 'product.bulk_deleted', {
+        "deleted_count": count,
+        "timestamp": datetime.utcnow().isoformat(),
+        **event
+    })
+
+
+def _truncate_products(job_id: str, event: dict) -> int:
+    """
+    Empty the products table; TRUNCATE doesn't scan or WAL-log the rows.
+    Its tombstones go too, replaced by a reset marker for the change feed.
+    """
+    db = SessionLocal()
+    try:
+        checkpoint = load_job_checkpoint(db, job_id, "delete")
+        if checkpoint:
+            # Already done by an earlier attempt
+            return checkpoint["deleted"]
+        # Lock first so the count is exactly what TRUNCATE removes
+        db.execute(text("LOCK TABLE products IN ACCESS EXCLUSIVE MODE"))
+        count = db.execute(select(func.count(Product.id))).scalar()
+        db.execute(text("TRUNCATE products, product_tombstones"))
+        db.execute(insert_reset_marker())
+        _bulk_deleted_event(db, event, count)
+        save_job_checkpoint(db, job_id, "delete", 0, {"deleted": count, "done": True})
+        prune_job_checkpoints(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error truncating products: {str(e)}")
+        raise
+    finally:
+        db.close()
+    invalidate_products(all_items=True)
+    return count
+
+
+def _delete_in_batches(job_id: str, search: str, active: str, event: dict) -> int:
+    """
+    Delete matching products DELETE_BATCH_SIZE at a time in id order, each
+    batch in its own transaction, so no long transaction holds locks or
+    piles up WAL. The count and last id reached are checkpointed with every
+    batch, so a retried job picks up where the last one stopped and still
+    reports every row it deleted.
+    """
+    db = SessionLocal()
+    try:
+        checkpoint = load_job_checkpoint(db, job_id, "delete") or {"offset": 0, "deleted": 0}
+        after, deleted = checkpoint["offset"], checkpoint["deleted"]
+        if checkpoint.get("done"):
+            return deleted
+        matching = apply_product_filters(select(Product.id), search, active)
+        total = deleted + db.execute(
+            select(func.count()).select_from(matching.filter(Product.id > after).subquery())
+        ).scalar()
+        publish_progress(job_id, {
+            "status": "processing",
+            "stage": "delete",
+            "deleted": deleted,
+            "total": total,
+            "percent": min(99, int(deleted / total * 100)) if total else 0
+        })
+
+        while True:
+            batch = matching.filter(Product.id > after).order_by(Product.id).limit(DELETE_BATCH_SIZE)
+            rows = db.execute(
+                delete(Product).where(Product.id.in_(batch.scalar_subquery())).returning(Product.id, Product.sku)
+            ).all()
+            ids = [row.id for row in rows]
+            if rows:
+                db.execute(insert_tombstones(rows))
+            deleted += len(ids)
+            if ids:
+                after = max(ids)
+            last = len(ids) < DELETE_BATCH_SIZE
+            if last:
+                _bulk_deleted_event(db, event, deleted)
+                prune_job_checkpoints(db)
+            save_job_checkpoint(db, job_id, "delete", after, {"deleted": deleted, "done": last})
+            db.commit()
+            if ids:
+                invalidate_products(ids)
+            if last:
+                return deleted
+            publish_progress(job_id, {
+                "status": "processing",
+                "stage": "delete",
+                "deleted": deleted,
+                "total": total,
+                "percent": min(99, int(deleted / total * 100)) if total else 99
+            })
+    except Exception as e:
+        db.rollback()
+        print(f"Error deleting products: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+@celery.task(bind=True, max_retries=3, default_retry_delay=10)
+def bulk_update_task(self, job_id: str, selectors: dict, patch: dict):
+    """
+    Apply a bulk update patch to a large set of products in id-ordered
+    batches, each committed with its product.updated events, reporting
+    progress on the job's channel. The last id reached is checkpointed in
+    the transaction of every batch, so a retried job resumes exactly there
+    instead of applying a price multiplier twice, and a job that finished
+    only reports its result again.
+    """
+    started_at = time.time()
+    db = SessionLocal()
+    try:
+        checkpoint = load_job_checkpoint(db, job_id, "update") or {"offset": 0, "scanned": 0, "updated": 0}
+        after, scanned, updated = checkpoint["offset"], checkpoint["scanned"], checkpoint["updated"]
+        done = checkpoint.get("done", False)
+        matching = matching_ids(**selectors)
+        total = scanned + db.execute(
+            select(func.count()).select_from(matching.filter(Product.id > after).subquery())
+        ).scalar()
+        publish_progress(job_id, {"status": "processing", "stage": "update", "updated": updated, "total": total, "percent": 0})
+
+        while not done:
+            ids = db.execute(
+                matching.filter(Product.id > after).order_by(Product.id).limit(BULK_UPDATE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            rows = db.execute(update_statement(select(Product.id).filter(Product.id.in_(ids)), patch)).all()
+            if rows:
+                db.execute(insert_events(updated_events(rows)))
+            after, scanned, updated = ids[-1], scanned + len(ids), updated + len(rows)
+            save_job_checkpoint(db, job_id, "update", after, {"scanned": scanned, "updated": updated})
+            db.commit()
+            invalidate_products([row.id for row in rows])
+            publish_progress(job_id, {
+                "status": "processing",
+                "stage": "update",
+                "updated": updated,
+                "total": total,
+                "percent": min(99, int(scanned / total * 100)) if total else 99
+            })
+
+        if not done:
+            save_job_checkpoint(db, job_id, "update", after, {"scanned": scanned, "updated": updated, "done": True})
+            prune_job_checkpoints(db)
+            db.commit()
+        elapsed = time.time() - started_at
+        publish_progress(job_id, {
+            "status": "complete",
+            "percent": 100,
+            "updated_count": updated,
+            "rows_per_sec": round(updated / elapsed, 1) if elapsed > 0 else None,
+            "message": f"Successfully updated {updated} product(s)"
+        })
+        return {"updated_count": updated}
+    except Exception as exc:
+        db.rollback()
+        if isinstance(exc, DBAPIError) and is_invalid_value(exc):
+            # The same batch would fail again: report it instead of retrying
+            publish_progress(job_id, {"status": "error", "message": f"Invalid patch: {exc.orig}"})
+            return
+        raise _retry_or_fail(self, job_id, exc)
+    finally:
+        db.close()
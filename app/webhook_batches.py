@@ -0,0 +1,121 @@
+"""
+Event batching for webhooks that have batch_window_seconds or
+batch_max_events set.
+
+Instead of a Celery message and a POST per event, events for a batching
+webhook are buffered in Redis and delivered as one JSON array, signed like
+any other payload. Events about the same product_id collapse to the latest
+one, so a product updated many times within a window is sent once with its
+final state.
+
+The first event of a window schedules one flush_webhook_batch task for the
+end of the window; the event that fills the batch to batch_max_events
+flushes it right away. Each window has a token, so a scheduled flush whose
+window was already flushed early does nothing.
+"""
+import json
+import os
+
+from app.progress import redis_client
+
+BATCH_KEY_PREFIX = "webhooks:batch:"
+# Used for whichever of the two settings a batching webhook leaves unset
+WEBHOOK_BATCH_WINDOW_SECONDS = int(os.getenv("WEBHOOK_BATCH_WINDOW_SECONDS", "5"))
+WEBHOOK_BATCH_MAX_EVENTS = int(os.getenv("WEBHOOK_BATCH_MAX_EVENTS", "1000"))
+# Buffers of deleted webhooks are not flushed; they expire instead
+BATCH_KEY_TTL = 24 * 3600
+
+# KEYS[1] buffer hash, KEYS[2] order zset, KEYS[3] sequence, KEYS[4] window token
+# ARGV collapse key ('' for none), payload, window seconds, max events, key ttl
+# Returns {window token if this event opened a window else '', 1 if the batch is full}
+BUFFER_SCRIPT = """
+local seq = redis.call('INCR', KEYS[3])
+local key = ARGV[1]
+if key == '' then
+    key = 'event:' .. seq
+end
+local added = redis.call('HSET', KEYS[1], key, ARGV[2])
+redis.call('ZADD', KEYS[2], seq, key)
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[5])
+end
+local full = 0
+if added == 1 and redis.call('HLEN', KEYS[1]) == tonumber(ARGV[4]) then
+    full = 1
+end
+local window = ''
+-- The token outlives the window, in case its flush runs late
+if redis.call('SET', KEYS[4], seq, 'NX', 'EX', tonumber(ARGV[3]) * 2 + 60) then
+    window = tostring(seq)
+end
+return {window, full}
+"""
+
+# KEYS[1] buffer hash, KEYS[2] order zset, KEYS[3] window token
+# ARGV window token ('' to flush now)
+# Returns {collapse keys in order, flat field/value list of the buffer}
+TAKE_SCRIPT = """
+local current = redis.call('GET', KEYS[3])
+if ARGV[1] ~= '' and current and current ~= ARGV[1] then
+    return {{}, {}}
+end
+redis.call('DEL', KEYS[3])
+local order = redis.call('ZRANGE', KEYS[2], 0, -1)
+local events = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1], KEYS[2])
+return {order, events}
+"""
+
+_buffer = redis_client.register_script(BUFFER_SCRIPT)
+_take = redis_client.register_script(TAKE_SCRIPT)
+
+
+def _batch_key(webhook_id: int, suffix: str = "") -> str:
+    return f"{BATCH_KEY_PREFIX}{webhook_id}{suffix}"
+
+
+def batching(webhook) -> bool:
+    """Whether a webhook (model or WebhookConfig) gets its events in batches"""
+    return bool(webhook.batch_window_seconds or webhook.batch_max_events)
+
+
+def batch_window(webhook) -> int:
+    return webhook.batch_window_seconds or WEBHOOK_BATCH_WINDOW_SECONDS
+
+
+def buffer_event(webhook, payload: dict) -> tuple:
+    """
+    Add an event to a batching webhook's buffer. Returns (window, full):
+    the token of the window this event opened, for the caller to schedule
+    its flush, or None; and whether the batch should be flushed now.
+    """
+    product_id = payload.get("product_id")
+    window, full = _buffer(
+        keys=[
+            _batch_key(webhook.id), _batch_key(webhook.id, ":order"),
+            _batch_key(webhook.id, ":seq"), _batch_key(webhook.id, ":window"),
+        ],
+        args=[
+            "" if product_id is None else f"product:{product_id}",
+            json.dumps(payload),
+            batch_window(webhook),
+            webhook.batch_max_events or WEBHOOK_BATCH_MAX_EVENTS,
+            BATCH_KEY_TTL,
+        ]
+    )
+    window = window.decode() if isinstance(window, bytes) else window
+    return window or None, bool(full)
+
+
+def take_batch(webhook_id: int, window: str = None) -> list:
+    """
+    Remove and return the buffered events of a webhook, oldest first (a
+    collapsed event counts from its latest update). Given the token of a
+    window that has been superseded by a newer one, returns nothing.
+    """
+    order, flat = _take(
+        keys=[_batch_key(webhook_id), _batch_key(webhook_id, ":order"), _batch_key(webhook_id, ":window")],
+        args=[window or ""]
+    )
+    events = dict(zip(flat[::2], flat[1::2]))
+    return [json.loads(events[key]) for key in order if key in events]
@@ -0,0 +1,220 @@
+"""
+Per-webhook circuit breakers, shared by all workers through Redis.
+
+closed     deliveries go through; outcomes are counted in a window of
+           BREAKER_WINDOW_SECONDS. Once it holds BREAKER_MIN_REQUESTS
+           outcomes and at least BREAKER_FAILURE_RATE of them failed, the
+           breaker opens. Responses slower than BREAKER_SLOW_MS count as
+           failures.
+open       deliveries are not attempted until open_until; they are held
+           in a per-webhook Redis list until then instead of waiting on a
+           dead endpoint, and a single task sends them when it reopens.
+half_open  after open_until a single probe delivery goes through. Success
+           closes the breaker; failure opens it again for twice as long
+           (exponential backoff with jitter, capped at
+           BREAKER_MAX_OPEN_SECONDS).
+
+State changes run as Lua scripts, so concurrent workers see one consistent
+breaker per webhook.
+"""
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from app.progress import redis_client, async_redis_client
+
+BREAKER_KEY_PREFIX = "webhooks:breaker:"
+DEFERRED_KEY_PREFIX = "webhooks:deferred:"
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_MS = float(os.getenv("BREAKER_SLOW_MS", "5000"))
+BREAKER_BASE_OPEN_SECONDS = float(os.getenv("BREAKER_BASE_OPEN_SECONDS", "30"))
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS", "1800"))
+# How long a half-open probe may take before another one is allowed
+BREAKER_PROBE_TIMEOUT = 30
+# Deliveries held back by an open breaker are dropped after this many deferrals
+BREAKER_MAX_DEFERRALS = int(os.getenv("BREAKER_MAX_DEFERRALS", "24"))
+BREAKER_KEY_TTL = 7 * 24 * 3600
+
+# Retries of failed deliveries: exponential backoff from 60s with jitter
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+
+# KEYS[1] breaker hash; ARGV now, probe timeout, key ttl
+# Returns {allowed (0/1), state, seconds to wait as a string}
+ACQUIRE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {1, state, '0'}
+end
+local now = tonumber(ARGV[1])
+local open_until = tonumber(redis.call('HGET', KEYS[1], 'open_until') or '0')
+if now < open_until then
+    return {0, state, tostring(open_until - now)}
+end
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'open_until', now + tonumber(ARGV[2]))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, 'half_open', '0'}
+"""
+
+# KEYS[1] breaker hash; ARGV now, ok (1/0), latency ms, window, min requests,
+# failure rate, base open seconds, max open seconds, jitter in [0, 1), key ttl
+# Returns the state after recording the outcome
+RECORD_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local ok = ARGV[2] == '1'
+local state = redis.call('HGET', key, 'state') or 'closed'
+
+local function trip()
+    local trips = redis.call('HINCRBY', key, 'trips', 1)
+    local backoff = math.min(tonumber(ARGV[7]) * 2 ^ (trips - 1), tonumber(ARGV[8]))
+    local open_for = backoff / 2 + backoff / 2 * tonumber(ARGV[9])
+    redis.call('HSET', key, 'state', 'open', 'opened_at', now, 'open_until', now + open_for,
+        'window_start', now, 'total', 0, 'failures', 0)
+    return 'open'
+end
+
+if ARGV[3] ~= '' then
+    local latency = tonumber(redis.call('HGET', key, 'latency_ms') or ARGV[3])
+    redis.call('HSET', key, 'latency_ms', latency * 0.8 + tonumber(ARGV[3]) * 0.2)
+end
+redis.call('EXPIRE', key, ARGV[10])
+
+if state == 'half_open' then
+    if ok then
+        redis.call('HDEL', key, 'state', 'open_until', 'opened_at', 'trips')
+        redis.call('HSET', key, 'window_start', now, 'total', 0, 'failures', 0)
+        return 'closed'
+    end
+    return trip()
+end
+
+local window_start = tonumber(redis.call('HGET', key, 'window_start') or '0')
+if now - window_start >= tonumber(ARGV[4]) then
+    redis.call('HSET', key, 'window_start', now, 'total', 0, 'failures', 0)
+end
+local total = redis.call('HINCRBY', key, 'total', 1)
+local failures = tonumber(redis.call('HGET', key, 'failures') or '0')
+if not ok then
+    failures = redis.call('HINCRBY', key, 'failures', 1)
+end
+if state == 'closed' and total >= tonumber(ARGV[5]) and failures / total >= tonumber(ARGV[6]) then
+    return trip()
+end
+return state
+"""
+
+# KEYS[1] deferred list, KEYS[2] drain flag; ARGV flag ttl, key ttl, entries
+# Returns 1 when no drain of the list was pending, so the caller schedules one
+DEFER_SCRIPT = """
+for i = 3, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if redis.call('SET', KEYS[2], 1, 'NX', 'EX', ARGV[1]) then
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] deferred list, KEYS[2] drain flag
+# Returns the entries of the list, oldest first, and empties it
+TAKE_DEFERRED_SCRIPT = """
+local entries = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+return entries
+"""
+
+_acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+_record = redis_client.register_script(RECORD_SCRIPT)
+_defer = redis_client.register_script(DEFER_SCRIPT)
+_take_deferred = redis_client.register_script(TAKE_DEFERRED_SCRIPT)
+
+
+def _breaker_key(webhook_id: int) -> str:
+    return f"{BREAKER_KEY_PREFIX}{webhook_id}"
+
+
+def acquire(webhook_id: int) -> tuple:
+    """
+    Ask the breaker of a webhook whether a delivery may be attempted now.
+    Returns (allowed, seconds to wait before trying again when not).
+    """
+    allowed, _state, wait = _acquire(
+        keys=[_breaker_key(webhook_id)],
+        args=[time.time(), BREAKER_PROBE_TIMEOUT, BREAKER_KEY_TTL]
+    )
+    return bool(allowed), float(wait)
+
+
+def record(webhook_id: int, result) -> str:
+    """Feed a delivery outcome (DeliveryResult) to the breaker; returns its new state"""
+    ok = result.success and result.response_time_ms < BREAKER_SLOW_MS
+    state = _record(
+        keys=[_breaker_key(webhook_id)],
+        args=[
+            time.time(), "1" if ok else "0",
+            "" if result.response_time_ms is None else result.response_time_ms,
+            BREAKER_WINDOW_SECONDS, BREAKER_MIN_REQUESTS, BREAKER_FAILURE_RATE,
+            BREAKER_BASE_OPEN_SECONDS, BREAKER_MAX_OPEN_SECONDS, random.random(),
+            BREAKER_KEY_TTL,
+        ]
+    )
+    return state.decode() if isinstance(state, bytes) else state
+
+
+def _deferred_keys(webhook_id: int) -> list:
+    return [f"{DEFERRED_KEY_PREFIX}{webhook_id}", f"{DEFERRED_KEY_PREFIX}{webhook_id}:drain"]
+
+
+def defer(webhook_id: int, deliveries: list, countdown: float) -> bool:
+    """
+    Hold (event_type, payload) deliveries to a webhook until its breaker
+    reopens. Returns whether the caller has to schedule the drain of the
+    held deliveries in countdown seconds: only one is pending at a time.
+    """
+    drain = _defer(
+        keys=_deferred_keys(webhook_id),
+        # The flag outlives the drain's countdown, in case it runs late
+        args=[int(countdown) + BREAKER_PROBE_TIMEOUT, BREAKER_KEY_TTL] +
+             [json.dumps([event_type, payload]) for event_type, payload in deliveries]
+    )
+    return bool(drain)
+
+
+def take_deferred(webhook_id: int) -> list:
+    """Remove and return the (event_type, payload) deliveries held for a webhook, oldest first"""
+    return [tuple(json.loads(entry)) for entry in _take_deferred(keys=_deferred_keys(webhook_id))]
+
+
+def retry_delay(retries: int) -> float:
+    """Countdown before retry number retries + 1 of a failed delivery"""
+    backoff = min(RETRY_BASE_SECONDS * 2 ** retries, RETRY_MAX_SECONDS)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+async def breaker_states(webhook_ids: list) -> dict:
+    """Breaker state, reopening time and average latency per webhook id"""
+    if not webhook_ids:
+        return {}
+    pipe = async_redis_client.pipeline(transaction=False)
+    for webhook_id in webhook_ids:
+        pipe.hgetall(_breaker_key(webhook_id))
+    replies = await pipe.execute()
+
+    states = {}
+    for webhook_id, reply in zip(webhook_ids, replies):
+        fields = {key.decode(): value.decode() for key, value in reply.items()}
+        state = fields.get("state", "closed")
+        states[webhook_id] = {
+            "breaker_state": state,
+            "breaker_open_until": (
+                datetime.utcfromtimestamp(float(fields["open_until"])) if state == "open" else None
+            ),
+            "avg_latency_ms": round(float(fields["latency_ms"]), 1) if "latency_ms" in fields else None,
+        }
+    return states
@@ -0,0 +1,101 @@
+"""
+Pooled webhook delivery for Celery workers.
+
+DeliveryEngine runs an asyncio event loop in a daemon thread of the worker
+process with one shared httpx.AsyncClient, so deliveries reuse keep-alive
+connections instead of paying a TCP+TLS handshake each, and a task can
+send many deliveries concurrently instead of one at a time. Concurrent
+requests to the same host are capped by a per-host semaphore.
+
+The engine is started lazily and again after a fork, since Celery's
+prefork pool forks workers after the app module has been imported.
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+WEBHOOK_HOST_CONCURRENCY = int(os.getenv("WEBHOOK_HOST_CONCURRENCY", "10"))
+
+
+class DeliveryResult:
+    """Outcome of one delivery: a response status, or the exception raised"""
+
+    def __init__(self, status_code: int = None, response_time_ms: float = None, exception: Exception = None):
+        self.status_code = status_code
+        self.response_time_ms = response_time_ms
+        self.exception = exception
+
+    @property
+    def success(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+    @property
+    def timed_out(self) -> bool:
+        return isinstance(self.exception, httpx.TimeoutException)
+
+
+class DeliveryEngine:
+    def __init__(self, max_connections: int = WEBHOOK_MAX_CONNECTIONS, host_concurrency: int = WEBHOOK_HOST_CONCURRENCY):
+        self.max_connections = max_connections
+        self.host_concurrency = host_concurrency
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+        self._host_limits = {}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="webhook-delivery", daemon=True)
+            thread.start()
+            self._loop, self._pid, self._host_limits = loop, os.getpid(), {}
+            self._client = asyncio.run_coroutine_threadsafe(self._make_client(), loop).result()
+
+    async def _make_client(self):
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        return httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, limits=limits)
+
+    async def _send(self, url: str, body: str, headers: dict) -> DeliveryResult:
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.host_concurrency)
+
+        async with limit:
+            start_time = time.time()
+            try:
+                response = await self._client.post(url, content=body, headers=headers)
+            except Exception as exc:
+                return DeliveryResult(exception=exc)
+            return DeliveryResult(response.status_code, (time.time() - start_time) * 1000)
+
+    async def _send_all(self, deliveries: list) -> list:
+        return await asyncio.gather(*(self._send(*delivery) for delivery in deliveries))
+
+    def deliver_many(self, deliveries: list) -> list:
+        """
+        Send (url, body, headers) deliveries concurrently and wait for all of
+        them. Returns a DeliveryResult per delivery, in the same order.
+        """
+        if not deliveries:
+            return []
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._send_all(deliveries), self._loop).result()
+
+    def deliver(self, url: str, body: str, headers: dict) -> DeliveryResult:
+        return self.deliver_many([(url, body, headers)])[0]
+
+
+delivery_engine = DeliveryEngine()
@@ -0,0 +1,90 @@
+"""
+In-process registry of webhook subscriptions, keyed by event_type.
+
+Every process that produces events (API workers, Celery workers) keeps the
+enabled webhooks in memory, so an event is routed without a database query
+and an event nobody subscribes to costs nothing. The webhook CRUD routes
+publish on WEBHOOKS_CHANNEL after every change; a listener thread in each
+process reloads the registry when that happens, and at least every
+WEBHOOK_REGISTRY_REFRESH seconds in case a message was missed.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from app.database import SessionLocal
+from app.models.webhook import Webhook
+from app.progress import redis_client, async_redis_client
+
+WEBHOOKS_CHANNEL = "webhooks:changed"
+WEBHOOK_REGISTRY_REFRESH = int(os.getenv("WEBHOOK_REGISTRY_REFRESH", "60"))
+
+# What a delivery needs to know about a webhook. Travels through Celery as a
+# JSON list, and has the same attributes as the Webhook model. The batch
+# fields default to None for lists queued before they were added.
+WebhookConfig = namedtuple(
+    "WebhookConfig",
+    ["id", "url", "event_type", "secret", "headers", "batch_window_seconds", "batch_max_events"],
+    defaults=(None, None)
+)
+
+
+class SubscriptionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._subscriptions = {}
+
+    def _load(self):
+        db = SessionLocal()
+        try:
+            webhooks = db.query(Webhook).filter(Webhook.enabled == True).order_by(Webhook.id).all()
+            subscriptions = {}
+            for webhook in webhooks:
+                subscriptions.setdefault(webhook.event_type, []).append(WebhookConfig(
+                    webhook.id, webhook.url, webhook.event_type, webhook.secret, webhook.headers,
+                    webhook.batch_window_seconds, webhook.batch_max_events
+                ))
+        finally:
+            db.close()
+        # Readers see either the old or the new mapping, never a partial one
+        self._subscriptions = subscriptions
+
+    def _listen(self, pubsub):
+        refreshed_at = time.monotonic()
+        while True:
+            try:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message or time.monotonic() - refreshed_at >= WEBHOOK_REGISTRY_REFRESH:
+                    self._load()
+                    refreshed_at = time.monotonic()
+            except Exception as e:
+                print(f"Webhook registry refresh failed: {str(e)}")
+                time.sleep(1)
+
+    def start(self):
+        """Load the registry and start listening for changes, once per process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Subscribe before loading so no change can fall in between
+            pubsub = redis_client.pubsub()
+            pubsub.subscribe(WEBHOOKS_CHANNEL)
+            self._load()
+            threading.Thread(target=self._listen, args=(pubsub,), name="webhook-registry", daemon=True).start()
+            self._pid = os.getpid()
+
+    def subscribers(self, event_type: str) -> list:
+        """WebhookConfigs of the enabled webhooks subscribed to event_type"""
+        if self._pid != os.getpid():
+            self.start()
+        return self._subscriptions.get(event_type, [])
+
+
+webhook_registry = SubscriptionRegistry()
+
+
+async def notify_webhooks_changed():
+    """Call after any committed change to the webhooks table"""
+    await async_redis_client.publish(WEBHOOKS_CHANNEL, "changed")
@@ -0,0 +1,140 @@
+"""
+Webhook delivery statistics, counted in Redis and flushed to Postgres.
+
+Deliveries HINCRBY a per-webhook hash instead of updating the webhooks row,
+so concurrent deliveries to one webhook never wait on each other or lose
+increments. flush_webhook_stats (run by Celery beat) moves the counts into
+the webhooks table in one short transaction, and the API adds counts that
+are not flushed yet when it returns webhooks.
+"""
+from datetime import datetime
+
+import redis
+from sqlalchemy import func, update
+
+from app.database import SessionLocal
+from app.models.webhook import Webhook
+from app.progress import redis_client, async_redis_client
+
+STATS_KEY_PREFIX = "webhooks:stats:"
+DIRTY_KEY = "webhooks:stats:dirty"
+
+
+def _stats_key(webhook_id: int) -> str:
+    return f"{STATS_KEY_PREFIX}{webhook_id}"
+
+
+def _flushing_key(webhook_id: int) -> str:
+    return f"{STATS_KEY_PREFIX}{webhook_id}:flushing"
+
+
+def record_deliveries(outcomes: list):
+    """Count deliveries, given (webhook_id, DeliveryResult) pairs"""
+    now = datetime.utcnow().timestamp()
+    # A transaction, so a webhook's counts and its dirty flag land together
+    pipe = redis_client.pipeline()
+    for webhook_id, result in outcomes:
+        key = _stats_key(webhook_id)
+        pipe.hincrby(key, "success_count" if result.success else "failure_count", 1)
+        if result.exception is None:
+            pipe.hset(key, "last_triggered_at", now)
+        pipe.sadd(DIRTY_KEY, webhook_id)
+    pipe.execute()
+
+
+def _parse(stats: dict) -> dict:
+    stats = {
+        (field.decode() if isinstance(field, bytes) else field): value
+        for field, value in stats.items()
+    }
+    last_triggered_at = stats.get("last_triggered_at")
+    return {
+        "success_count": int(stats.get("success_count", 0)),
+        "failure_count": int(stats.get("failure_count", 0)),
+        "last_triggered_at": datetime.utcfromtimestamp(float(last_triggered_at)) if last_triggered_at else None,
+    }
+
+
+def flush_stats() -> int:
+    """
+    Add the counted statistics to the webhooks table. Returns the number of
+    webhooks updated.
+
+    Each webhook's hash is renamed before it is read, so deliveries counted
+    meanwhile start a new hash instead of being lost. The renamed hash is
+    deleted only after the update commits; one left behind by a failed
+    flush is picked up by the next one.
+    """
+    flushed = 0
+    for member in redis_client.smembers(DIRTY_KEY):
+        webhook_id = int(member)
+        redis_client.srem(DIRTY_KEY, member)
+        flushing_key = _flushing_key(webhook_id)
+        if redis_client.exists(flushing_key):
+            # Left by a failed flush: finish it, and newer counts next time
+            if redis_client.exists(_stats_key(webhook_id)):
+                redis_client.sadd(DIRTY_KEY, webhook_id)
+        else:
+            try:
+                redis_client.rename(_stats_key(webhook_id), flushing_key)
+            except redis.ResponseError:
+                # Nothing counted since the last flush
+                continue
+        stats = _parse(redis_client.hgetall(flushing_key))
+
+        values = {
+            "success_count": Webhook.success_count + stats["success_count"],
+            "failure_count": Webhook.failure_count + stats["failure_count"],
+        }
+        if stats["last_triggered_at"]:
+            values["last_triggered_at"] = func.greatest(
+                func.coalesce(Webhook.last_triggered_at, stats["last_triggered_at"]),
+                stats["last_triggered_at"]
+            )
+        db = SessionLocal()
+        try:
+            db.execute(update(Webhook).where(Webhook.id == webhook_id).values(**values))
+            db.commit()
+        except Exception:
+            redis_client.sadd(DIRTY_KEY, webhook_id)
+            raise
+        finally:
+            db.close()
+        redis_client.delete(flushing_key)
+        flushed += 1
+    return flushed
+
+
+async def pending_stats(webhook_ids: list) -> dict:
+    """Statistics counted but not flushed yet, per webhook id"""
+    if not webhook_ids:
+        return {}
+    pipe = async_redis_client.pipeline(transaction=False)
+    for webhook_id in webhook_ids:
+        pipe.hgetall(_flushing_key(webhook_id))
+        pipe.hgetall(_stats_key(webhook_id))
+    replies = await pipe.execute()
+
+    pending = {}
+    for i, webhook_id in enumerate(webhook_ids):
+        parts = [_parse(replies[2 * i]), _parse(replies[2 * i + 1])]
+        timestamps = [part["last_triggered_at"] for part in parts if part["last_triggered_at"]]
+        pending[webhook_id] = {
+            "success_count": sum(part["success_count"] for part in parts),
+            "failure_count": sum(part["failure_count"] for part in parts),
+            "last_triggered_at": max(timestamps) if timestamps else None,
+        }
+    return pending
+
+
+def merge_pending(webhook: dict, pending: dict) -> dict:
+    """Add a webhook's unflushed statistics to its response dict"""
+    stats = pending.get(webhook["id"])
+    if stats:
+        webhook["success_count"] = (webhook["success_count"] or 0) + stats["success_count"]
+        webhook["failure_count"] = (webhook["failure_count"] or 0) + stats["failure_count"]
+        if stats["last_triggered_at"] and (
+            webhook["last_triggered_at"] is None or stats["last_triggered_at"] > webhook["last_triggered_at"]
+        ):
+            webhook["last_triggered_at"] = stats["last_triggered_at"]
+    return webhook
@@ -1,18 +1,95 @@
 import json
 import time
-import requests
+import httpx
 import hmac
 import hashlib
 from datetime import datetime
 from app.celery_app import celery
-from app.database import SessionLocal
+from app.database import SessionLocal, engine
 from app.models.webhook import Webhook
+from app.webhook_delivery import delivery_engine, DeliveryResult
+from app.webhook_registry import webhook_registry, WebhookConfig
+from app.webhook_stats import record_deliveries, flush_stats
+from app.webhook_batches import batching, batch_window, buffer_event, take_batch
+from app.outbox import relay_lock, pending_events, delete_events, delivery_rounds, OUTBOX_BATCH_SIZE, OUTBOX_RELAY_MAX_SECONDS
+from app import webhook_breaker as breaker
+from app.webhook_breaker import BREAKER_MAX_DEFERRALS
 
-@celery.task(bind=True, max_retries=3, default_retry_delay=60)
-def trigger_webhook(self, webhook_id: int, event_type: str, payload: dict):
+def webhook_headers(webhook, event_type: str, payload: dict) -> dict:
     """
-    Asynchronously trigger a webhook with the given payload
+    Request headers for a delivery: event metadata, the webhook's custom
+    headers and, if it has a secret, the HMAC-SHA256 payload signature
     """
+    headers = {
+        "Content-Type": "application/json",
+        "X-Webhook-Event": event_type,
+        "X-Webhook-ID": str(webhook.id),
+        "User-Agent": "AcmeProductManager/1.0"
+    }
+    
+    # Add custom headers if provided
+    if webhook.headers:
+        try:
+            custom_headers = json.loads(webhook.headers)
+            headers.update(custom_headers)
+        except:
+            pass
+    
+    # Sign payload if secret is provided
+    if webhook.secret:
+        payload_str = json.dumps(payload, sort_keys=True)
+        signature = hmac.new(
+            webhook.secret.encode(),
+            payload_str.encode(),
+            hashlib.sha256
+        ).hexdigest()
+        headers["X-Webhook-Signature"] = f"sha256={signature}"
+    
+    return headers
+
+def webhook_body(payload: dict) -> str:
+    """Request body of a delivery, serialized like requests' json= argument"""
+    return json.dumps(payload, allow_nan=False)
+
+def _delivery_summary(result: DeliveryResult) -> dict:
+    summary = {
+        "success": result.success,
+        "status_code": result.status_code,
+        "response_time_ms": result.response_time_ms
+    }
+    if not result.success:
+        summary["error"] = f"HTTP {result.status_code}"
+    return summary
+
+def _defer(webhook_id: int, deliveries: list, wait: float, deferrals: int = 0) -> dict:
+    """
+    Hold (event_type, payload) deliveries to a webhook whose circuit breaker
+    is open until it may probe again. However many are held, one
+    deliver_deferred task per webhook sends them. Deferrals don't use up
+    the deliveries' retries, but deliveries deferred BREAKER_MAX_DEFERRALS
+    times are dropped as failed.
+    """
+    if deferrals >= BREAKER_MAX_DEFERRALS:
+        record_deliveries([(webhook_id, DeliveryResult(exception=Exception("Circuit open")))] * len(deliveries))
+        return {"success": False, "error": "Circuit open, delivery dropped", "dropped": len(deliveries)}
+    # A little past open_until, so the drain isn't turned away again
+    countdown = wait + 1
+    if breaker.defer(webhook_id, deliveries, countdown):
+        deliver_deferred.apply_async((webhook_id, deferrals + 1), countdown=countdown)
+    return {"success": False, "error": "Circuit open", "deferred_seconds": round(countdown, 1)}
+
+@celery.task(bind=True, max_retries=3)
+def trigger_webhook(self, webhook_id: int, event_type: str, payload: dict, deferrals: int = 0):
+    """
+    Asynchronously trigger a webhook with the given payload.
+    Timeouts and connection errors are retried with exponential backoff,
+    error responses are not. Nothing is sent while the webhook's circuit
+    breaker is open.
+    """
+    allowed, wait = breaker.acquire(webhook_id)
+    if not allowed:
+        return _defer(webhook_id, [(event_type, payload)], wait, deferrals)
+    
     db = SessionLocal()
     try:
         webhook = db.query(Webhook).filter(
@@ -23,186 +100,252 @@ def trigger_webhook(self, webhook_id: int, event_type: str, payload: dict):
         if not webhook:
             return {"success": False, "error": "Webhook not found or disabled"}
         
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "X-Webhook-Event": event_type,
-            "X-Webhook-ID": str(webhook_id),
-            "User-Agent": "AcmeProductManager/1.0"
-        }
-        
-        # Add custom headers if provided
-        if webhook.headers:
-            try:
-                custom_headers = json.loads(webhook.headers)
-                headers.update(custom_headers)
-            except:
-                pass
-        
-        # Sign payload if secret is provided
-        if webhook.secret:
-            payload_str = json.dumps(payload, sort_keys=True)
-            signature = hmac.new(
-                webhook.secret.encode(),
-                payload_str.encode(),
-                hashlib.sha256
-            ).hexdigest()
-            headers["X-Webhook-Signature"] = f"sha256={signature}"
-        
-        # Send webhook request
-        start_time = time.time()
-        response = requests.post(
-            webhook.url,
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        response_time = (time.time() - start_time) * 1000  # Convert to ms
-        
-        # Update webhook statistics
-        webhook.last_triggered_at = datetime.utcnow()
-        if response.status_code >= 200 and response.status_code < 300:
-            webhook.success_count += 1
-            db.commit()
-            return {
-                "success": True,
-                "status_code": response.status_code,
-                "response_time_ms": response_time
-            }
+        headers = webhook_headers(webhook, event_type, payload)
+        url = webhook.url
+    finally:
+        db.close()
+    
+    # Send webhook request through the worker's shared connection pool
+    result = delivery_engine.deliver(url, webhook_body(payload), headers)
+    record_deliveries([(webhook_id, result)])
+    breaker.record(webhook_id, result)
+    
+    countdown = breaker.retry_delay(self.request.retries)
+    if result.timed_out:
+        raise self.retry(exc=Exception("Webhook timeout"), countdown=countdown)
+    if result.exception is not None:
+        raise self.retry(exc=result.exception, countdown=countdown)
+    return _delivery_summary(result)
+
+def _deliver(deliveries: list, deferrals: int = 0) -> dict:
+    """
+    Send (event_type, payload, WebhookConfig) deliveries concurrently.
+
+    Deliveries that got no response are handed to trigger_webhook as its
+    first retry, so each one still gets max_retries retries in total.
+    Deliveries to webhooks whose circuit breaker is open are deferred,
+    deferrals times already when they come from deliver_deferred.
+    """
+    allowed_deliveries = []
+    held = {}
+    for event_type, payload, webhook in deliveries:
+        if webhook.id in held:
+            held[webhook.id][1].append((event_type, payload))
+            continue
+        allowed, wait = breaker.acquire(webhook.id)
+        if allowed:
+            allowed_deliveries.append((event_type, payload, webhook))
         else:
-            webhook.failure_count += 1
-            db.commit()
-            return {
-                "success": False,
-                "status_code": response.status_code,
-                "response_time_ms": response_time,
-                "error": f"HTTP {response.status_code}"
-            }
-            
-    except requests.exceptions.Timeout:
-        webhook.failure_count += 1
-        db.commit()
-        raise self.retry(exc=Exception("Webhook timeout"))
+            held[webhook.id] = (wait, [(event_type, payload)])
+    dropped = sum(
+        _defer(webhook_id, webhook_deliveries, wait, deferrals).get("dropped", 0)
+        for webhook_id, (wait, webhook_deliveries) in held.items()
+    )
     
-    except Exception as exc:
-        webhook.failure_count += 1
-        db.commit()
-        raise self.retry(exc=exc)
+    results = delivery_engine.deliver_many([
+        (webhook.url, webhook_body(payload), webhook_headers(webhook, event_type, payload))
+        for event_type, payload, webhook in allowed_deliveries
+    ])
+    record_deliveries([
+        (webhook.id, result) for (_, _, webhook), result in zip(allowed_deliveries, results)
+    ])
     
-    finally:
-        db.close()
+    for (event_type, payload, webhook), result in zip(allowed_deliveries, results):
+        breaker.record(webhook.id, result)
+        if result.exception is not None:
+            trigger_webhook.apply_async(
+                (webhook.id, event_type, payload),
+                countdown=breaker.retry_delay(0),
+                retries=1
+            )
+    
+    return {
+        "triggered": len(allowed_deliveries),
+        "deferred": len(deliveries) - len(allowed_deliveries) - dropped,
+        "dropped": dropped,
+        "failed": sum(1 for result in results if not result.success)
+    }
 
 @celery.task
-def trigger_webhooks_for_event(event_type: str, payload: dict):
+def deliver_webhooks(event_type: str, payload: dict, subscribers: list):
+    """
+    Deliver an event to the given subscribers (WebhookConfig lists). The
+    first attempt of every delivery is sent concurrently from this task.
     """
-    Trigger all enabled webhooks for a specific event type
+    return _deliver([(event_type, payload, WebhookConfig(*subscriber)) for subscriber in subscribers])
+
+@celery.task
+def deliver_deferred(webhook_id: int, deferrals: int = 1):
+    """
+    Send the deliveries held for a webhook while its circuit breaker was
+    open. If it is still open they are held again; once it lets a probe
+    through, the rest wait for the probe's outcome.
     """
+    deliveries = breaker.take_deferred(webhook_id)
+    if not deliveries:
+        return {"triggered": 0, "deferred": 0, "dropped": 0, "failed": 0}
+    
     db = SessionLocal()
     try:
-        webhooks = db.query(Webhook).filter(
-            Webhook.event_type == event_type,
+        webhook = db.query(Webhook).filter(
+            Webhook.id == webhook_id,
             Webhook.enabled == True
-        ).all()
+        ).first()
         
-        for webhook in webhooks:
-            # Dispatch each webhook asynchronously
-            trigger_webhook.delay(webhook.id, event_type, payload)
+        if not webhook:
+            return {"success": False, "error": "Webhook not found or disabled", "dropped": len(deliveries)}
         
-        return {"triggered": len(webhooks)}
-    
+        config = WebhookConfig(
+            webhook.id, webhook.url, webhook.event_type, webhook.secret, webhook.headers,
+            webhook.batch_window_seconds, webhook.batch_max_events
+        )
     finally:
         db.close()
+    
+    return _deliver([(event_type, payload, config) for event_type, payload in deliveries], deferrals)
 
-def test_webhook_sync(webhook_id: int):
+@celery.task
+def flush_webhook_stats():
+    """Move delivery statistics counted in Redis to the webhooks table (Celery beat)"""
+    return {"flushed": flush_stats()}
+
+@celery.task
+def flush_webhook_batch(subscriber: list, window: str = None):
     """
-    Synchronously test a webhook and return results immediately
-    Used by the test endpoint
+    Deliver the events buffered for a batching webhook as one JSON array.
+    Scheduled for the end of a window (window is its token), or sent right
+    away without one when the batch is full.
     """
-    db = SessionLocal()
-    try:
-        webhook = db.query(Webhook).filter(Webhook.id == webhook_id).first()
-        
-        if not webhook:
-            return {"success": False, "error": "Webhook not found"}
-        
-        # Prepare test payload
-        test_payload = {
-            "event": "test",
-            "webhook_id": webhook_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": {
-                "message": "This is a test webhook call",
-                "test": True
-            }
-        }
-        
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "X-Webhook-Event": "test",
-            "X-Webhook-ID": str(webhook_id),
-            "User-Agent": "AcmeProductManager/1.0"
+    webhook = WebhookConfig(*subscriber)
+    events = take_batch(webhook.id, window)
+    if not events:
+        return {"events": 0}
+    return {"events": len(events), **deliver_webhooks(webhook.event_type, events, [webhook])}
+
+def route_event(event_type: str, payload: dict) -> list:
+    """
+    Hand an event to its current subscribers' batches and return the
+    subscribers it must be delivered to directly. Subscribers come from the
+    in-process registry, so no query is made. For batching subscribers, a
+    flush task is queued only when the event opens a window or fills the
+    batch.
+    """
+    subscribers = []
+    for webhook in webhook_registry.subscribers(event_type):
+        if not batching(webhook):
+            subscribers.append(webhook)
+            continue
+        window, full = buffer_event(webhook, payload)
+        if full:
+            flush_webhook_batch.delay(webhook)
+        elif window:
+            flush_webhook_batch.apply_async((webhook, window), countdown=batch_window(webhook))
+    return subscribers
+
+def publish_event(event_type: str, payload: dict):
+    """
+    Queue the delivery of an event to its current subscribers. Nothing is
+    queued for events without direct subscribers.
+    """
+    subscribers = route_event(event_type, payload)
+    if subscribers:
+        deliver_webhooks.delay(event_type, payload, subscribers)
+
+@celery.task
+def relay_outbox():
+    """
+    Deliver committed outbox events, a batch at a time, until the outbox is
+    empty (Celery beat). A batch is deleted from the outbox only after its
+    first delivery attempts, so events are relayed at least once. No
+    transaction is open while webhooks are called (see app/outbox.py).
+    """
+    started = time.time()
+    relayed = 0
+    max_lag = 0.0
+    with relay_lock(engine) as conn:
+        if conn is None:
+            return {"relayed": 0, "max_lag_seconds": 0.0}
+        while time.time() - started < OUTBOX_RELAY_MAX_SECONDS:
+            events = pending_events(conn)
+            for events_round in delivery_rounds(events):
+                deliveries = []
+                for event in events_round:
+                    deliveries.extend(
+                        (event.event_type, event.payload, webhook)
+                        for webhook in route_event(event.event_type, event.payload)
+                    )
+                _deliver(deliveries)
+            if events:
+                delete_events(conn, events)
+                relayed += len(events)
+                max_lag = max(max_lag, (datetime.utcnow() - events[0].created_at).total_seconds())
+            if len(events) < OUTBOX_BATCH_SIZE:
+                break
+    return {"relayed": relayed, "max_lag_seconds": round(max_lag, 3)}
+
+@celery.task
+def trigger_webhooks_for_event(event_type: str, payload: dict):
+    """
+    Trigger all enabled webhooks for a specific event type.
+    Kept for messages queued before publish_event replaced it.
+    """
+    return deliver_webhooks(event_type, payload, webhook_registry.subscribers(event_type))
+
+async def test_webhook_async(webhook: Webhook):
+    """
+    Send a test event to a webhook and return the result immediately.
+    Used by the test endpoint, without holding a thread while waiting.
+    """
+    # Prepare test payload
+    test_payload = {
+        "event": "test",
+        "webhook_id": webhook.id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "data": {
+            "message": "This is a test webhook call",
+            "test": True
         }
-        
-        # Add custom headers
-        if webhook.headers:
-            try:
-                custom_headers = json.loads(webhook.headers)
-                headers.update(custom_headers)
-            except:
-                pass
-        
-        # Sign payload if secret is provided
-        if webhook.secret:
-            payload_str = json.dumps(test_payload, sort_keys=True)
-            signature = hmac.new(
-                webhook.secret.encode(),
-                payload_str.encode(),
-                hashlib.sha256
-            ).hexdigest()
-            headers["X-Webhook-Signature"] = f"sha256={signature}"
-        
-        # Send test request
-        start_time = time.time()
-        try:
-            response = requests.post(
+    }
+    headers = webhook_headers(webhook, "test", test_payload)
+    
+    # Send test request, with the body serialized like requests' json=
+    start_time = time.time()
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.post(
                 webhook.url,
-                json=test_payload,
-                headers=headers,
-                timeout=10
+                content=json.dumps(test_payload),
+                headers=headers
             )
-            response_time = (time.time() - start_time) * 1000
-            
-            return {
-                "success": response.status_code >= 200 and response.status_code < 300,
-                "status_code": response.status_code,
-                "response_time_ms": round(response_time, 2),
-                "response_body": response.text[:500] if response.text else None
-            }
-        
-        except requests.exceptions.Timeout:
-            response_time = (time.time() - start_time) * 1000
-            return {
-                "success": False,
-                "error": "Request timeout (10s)",
-                "response_time_ms": round(response_time, 2)
-            }
-        
-        except requests.exceptions.ConnectionError:
-            response_time = (time.time() - start_time) * 1000
-            return {
-                "success": False,
-                "error": "Connection failed",
-                "response_time_ms": round(response_time, 2)
-            }
+        response_time = (time.time() - start_time) * 1000
         
-        except Exception as e:
-            response_time = (time.time() - start_time) * 1000
-            return {
-                "success": False,
-                "error": str(e),
-                "response_time_ms": round(response_time, 2)
-            }
+        return {
+            "success": response.status_code >= 200 and response.status_code < 300,
+            "status_code": response.status_code,
+            "response_time_ms": round(response_time, 2),
+            "response_body": response.text[:500] if response.text else None
+        }
     
-    finally:
-        db.close()
\ No newline at end of file
+    except httpx.TimeoutException:
+        response_time = (time.time() - start_time) * 1000
+        return {
+            "success": False,
+            "error": "Request timeout (10s)",
+            "response_time_ms": round(response_time, 2)
+        }
+    
+    except httpx.ConnectError:
+        response_time = (time.time() - start_time) * 1000
+        return {
+            "success": False,
+            "error": "Connection failed",
+            "response_time_ms": round(response_time, 2)
+        }
+    
+    except Exception as e:
+        response_time = (time.time() - start_time) * 1000
+        return {
+            "success": False,
+            "error": str(e),
+            "response_time_ms": round(response_time, 2)
+        }
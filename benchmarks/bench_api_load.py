@@ -0,0 +1,95 @@
+"""
+Load-test a running API: requests/sec and latency percentiles at several
+concurrency levels.
+
+Usage:
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.bench_api_load --url http://127.0.0.1:8000 \\
+        --concurrency 10 50 200 --duration 15
+
+Each level runs --concurrency clients that request the --path list in
+turn for --duration seconds. A path may be prefixed with its method
+("POST /webhooks/1/test"); the default is GET.
+
+To compare the sync and async API, run the same command against a server
+started from each revision, with the same data and uvicorn settings. Add
+--path "POST /webhooks/1/test" for a webhook pointing at a slow receiver
+to see how blocking calls hold back unrelated requests.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = (
+    "/products?page=1&limit=20",
+    "/products?page=5&limit=20&search=widget",
+    "/products?cursor=&limit=20&sort=sku",
+    "/products/suggest?prefix=sku-00",
+    "/health",
+)
+
+
+async def client_loop(client, paths, deadline, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        method, path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run_level(url, paths, concurrency, duration):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            client_loop(client, paths, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentiles[49],
+        "p99": percentiles[98],
+        "errors": len(errors),
+    }
+
+
+async def main_async(args):
+    paths = [
+        tuple(path.split(" ", 1)) if " " in path else ("GET", path)
+        for path in args.path or DEFAULT_PATHS
+    ]
+    print(f"{'clients':>8}{'requests':>10}{'req/sec':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for concurrency in args.concurrency:
+        result = await run_level(args.url, paths, concurrency, args.duration)
+        print(
+            f"{concurrency:>8}{result['requests']:>10}{result['rps']:>10.0f}"
+            f"{result['p50']:>9.1f}{result['p99']:>9.1f}{result['errors']:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--path", action="append", help="request path, repeatable (default: a mix of product reads)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare products/sec of creating products one POST /products at a time
+against streaming them to POST /products/batch, on a running API.
+
+Usage:
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.bench_batch_api --url http://127.0.0.1:8000 --products 10000
+
+The single-request path is slow, so it gets at most --single-products
+products. The batch path streams NDJSON in one request, then sends the same
+body again, where every product is unchanged. Benchmark products get
+"bench-batch-" SKUs and are removed afterwards with a filtered bulk delete.
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+SKU_PREFIX = "bench-batch-"
+
+
+def make_products(count: int, offset: int = 0) -> list:
+    return [
+        {
+            "sku": f"{SKU_PREFIX}{i:08d}",
+            "name": f"Batch benchmark product {i}",
+            "description": f"Synthetic product {i}",
+            "price": round((i % 10000) / 100, 2),
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def run_single(client: httpx.Client, products: list) -> float:
+    started = time.perf_counter()
+    for product in products:
+        client.post("/products", json=product).raise_for_status()
+    return time.perf_counter() - started
+
+
+def ndjson_body(products: list, lines_per_chunk: int = 500):
+    for i in range(0, len(products), lines_per_chunk):
+        yield "".join(json.dumps(product) + "\n" for product in products[i:i + lines_per_chunk]).encode()
+
+
+def run_batch(client: httpx.Client, products: list) -> tuple:
+    started = time.perf_counter()
+    response = client.post(
+        "/products/batch",
+        content=ndjson_body(products),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+    seconds = time.perf_counter() - started
+    result = response.json()
+    return seconds, {key: result[key] for key in ("inserted", "updated", "unchanged", "failed")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--single-products", type=int, default=500)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=600) as client:
+        try:
+            print(f"{'path':<18}{'products':>10}{'seconds':>10}{'per sec':>10}  result")
+            count = min(args.single_products, args.products)
+            seconds = run_single(client, make_products(count, offset=args.products))
+            print(f"{'POST /products':<18}{count:>10}{seconds:>10.2f}{count / seconds:>10.0f}")
+
+            products = make_products(args.products)
+            for name in ("batch (new)", "batch (unchanged)"):
+                seconds, result = run_batch(client, products)
+                print(f"{name:<18}{len(products):>10}{seconds:>10.2f}{len(products) / seconds:>10.0f}  {result}")
+        finally:
+            client.delete("/products/bulk-delete", params={"search": SKU_PREFIX})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare rows/sec of the CSV ingest engines against the database in DATABASE_URL.
+
+Usage:
+    python -m benchmarks.bench_ingest --rows 500000
+
+Generates synthetic product rows (SKUs prefixed with "bench-") and writes
+them through _bulk_upsert and _copy_upsert in three phases: fresh inserts,
+a re-import that changes every row, and a re-import of identical rows
+(skipped by change detection). The benchmark rows are deleted afterwards.
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from app.database import SessionLocal, engine
+from app.models.product import Product, Base
+from app.tasks import _bulk_upsert, _copy_upsert, BATCH_SIZE, COPY_BATCH_SIZE
+
+
+def make_rows(count: int, price_offset: int = 0) -> list:
+    return [
+        {
+            "sku": f"bench-{i:08d}",
+            "name": f"Benchmark product {i}",
+            "description": f"Synthetic row {i} for ingest benchmarking",
+            "price": Decimal(i % 10000 + price_offset) / 100,
+            "active": True,
+        }
+        for i in range(count)
+    ]
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.query(Product).filter(Product.sku.like("bench-%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(flush_rows, rows: list, batch_size: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        flush_rows(rows[i:i + batch_size])
+    return len(rows) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    engine.echo = False
+
+    engines = [
+        ("upsert", _bulk_upsert, BATCH_SIZE),
+        ("copy", _copy_upsert, COPY_BATCH_SIZE),
+    ]
+    print(f"{'engine':<10}{'phase':<10}{'rows/sec':>12}")
+    try:
+        for name, flush_rows, batch_size in engines:
+            cleanup()
+            insert_rate = run(flush_rows, make_rows(args.rows), batch_size)
+            update_rate = run(flush_rows, make_rows(args.rows, price_offset=1), batch_size)
+            unchanged_rate = run(flush_rows, make_rows(args.rows, price_offset=1), batch_size)
+            print(f"{name:<10}{'insert':<10}{insert_rate:>12.0f}")
+            print(f"{name:<10}{'update':<10}{update_rate:>12.0f}")
+            print(f"{name:<10}{'unchanged':<10}{unchanged_rate:>12.0f}")
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
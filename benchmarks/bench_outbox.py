@@ -0,0 +1,132 @@
+"""
+Measure the outbox relay against the database in DATABASE_URL and Redis in
+REDIS_URL: throughput draining a backlog, and event latency (commit to
+receipt) under a steady stream of writes.
+
+Usage:
+    python -m benchmarks.bench_outbox --events 5000 --products 100 --rate 200
+
+A temporary product.updated webhook points at the stand-in receiver from
+bench_webhooks. The drain phase inserts --events events up front and times
+one relay_outbox run. The steady phase commits --rate events per second
+(one transaction each, like the API) for --seconds while the relay runs
+every --interval seconds, like Celery beat. Both phases check that every
+product's events arrive in commit order. The webhook is deleted afterwards.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+
+from app.database import SessionLocal
+from app.models.webhook import Webhook
+from app.outbox import add_event
+from app.webhook_tasks import relay_outbox
+from benchmarks.bench_webhooks import Receiver
+
+
+class Collector:
+    """Records event latency and out-of-order events per product"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latencies = []
+        self.last_seq = {}
+        self.out_of_order = 0
+
+    def on_body(self, body: bytes):
+        event = json.loads(body)
+        self.latencies.append(time.time() - event["sent_at"])
+        if event["seq"] < self.last_seq.get(event["product_id"], -1):
+            self.out_of_order += 1
+        self.last_seq[event["product_id"]] = event["seq"]
+
+    def received(self) -> int:
+        return len(self.latencies)
+
+
+def insert_events(count: int, products: int, start: int = 0):
+    db = SessionLocal()
+    try:
+        for seq in range(start, start + count):
+            add_event(db, "product.updated", {"product_id": seq % products, "seq": seq, "sent_at": time.time()})
+        db.commit()
+    finally:
+        db.close()
+
+
+def produce(count: int, products: int, rate: float, start: int):
+    for seq in range(start, start + count):
+        insert_events(1, products, seq)
+        time.sleep(1 / rate)
+
+
+def wait_for(collector: Collector, count: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while collector.received() < count and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def percentile(values: list, pct: float) -> float:
+    return statistics.quantiles(values, n=100)[pct - 1] if len(values) > 1 else values[0]
+
+
+def report(name: str, collector: Collector, count: int, seconds: float):
+    latencies = collector.latencies
+    print(
+        f"{name:<8}{count:>8}{count / seconds:>12.0f}"
+        f"{percentile(latencies, 50) * 1000:>10.0f}{percentile(latencies, 99) * 1000:>10.0f}"
+        f"{collector.out_of_order:>14}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=200, help="events/sec in the steady phase")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between relay runs")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=18180)
+    args = parser.parse_args()
+
+    collector = Collector()
+    receiver = Receiver([args.port], args.latency_ms / 1000, on_body=collector.on_body)
+    receiver.start()
+
+    db = SessionLocal()
+    webhook = Webhook(name="bench-outbox", url=f"http://127.0.0.1:{args.port}/hook", event_type="product.updated")
+    db.add(webhook)
+    db.commit()
+    try:
+        print(f"{'phase':<8}{'events':>8}{'events/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'out of order':>14}")
+
+        insert_events(args.events, args.products)
+        started = time.perf_counter()
+        relay_outbox()
+        wait_for(collector, args.events)
+        report("drain", collector, args.events, time.perf_counter() - started)
+
+        collector.reset()
+        count = int(args.rate * args.seconds)
+        producer = threading.Thread(target=produce, args=(count, args.products, args.rate, args.events))
+        started = time.perf_counter()
+        producer.start()
+        while producer.is_alive():
+            relay_outbox()
+            time.sleep(args.interval)
+        relay_outbox()
+        wait_for(collector, count)
+        report("steady", collector, count, time.perf_counter() - started)
+    finally:
+        db.delete(webhook)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Check that the csv and arrow parsers produce the same rows, and compare
+their parse + normalize throughput. No database is needed.
+
+Usage:
+    python -m benchmarks.bench_parsers path/to/products.csv
+    python -m benchmarks.bench_parsers --rows 500000   # synthetic file
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from app.arrow_source import ArrowCsvSource, normalize_batch
+from app.csv_source import CsvSource
+from app.tasks import _normalize_row, BATCH_SIZE
+
+
+def write_synthetic(path: str, rows: int):
+    prices = ["12.50", " 7 ", "", "abc", "1e2", "0.333", "  ", "-4.10"]
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["sku", "name", "description", "price"])
+        for i in range(rows):
+            writer.writerow([
+                f"  SKU-{i:07d} " if i % 50 else "",
+                f"Product {i}\t",
+                "multi\nline" if i % 7 == 0 else f"Description {i}",
+                random.choice(prices),
+            ])
+
+
+def read_csv(path: str) -> list:
+    rows = []
+    with CsvSource(path) as source:
+        for row in source:
+            normalized = _normalize_row(row)
+            if normalized is not None:
+                rows.append(normalized)
+    return rows
+
+
+def read_arrow(path: str) -> list:
+    rows = []
+    with ArrowCsvSource(path) as source:
+        for batch in source.iter_batches(BATCH_SIZE):
+            rows.extend(normalize_batch(batch))
+    return rows
+
+
+def same_row(a: dict, b: dict) -> bool:
+    # Decimal("NaN") parses on both paths but never compares equal
+    if a["price"].is_nan() and b["price"].is_nan():
+        a, b = dict(a, price=None), dict(b, price=None)
+    return a == b
+
+
+def timed(read, path: str):
+    started = time.perf_counter()
+    rows = read(path)
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        write_synthetic(path, args.rows)
+
+    try:
+        csv_rows, csv_seconds = timed(read_csv, path)
+        arrow_rows, arrow_seconds = timed(read_arrow, path)
+    finally:
+        if args.path is None:
+            os.remove(path)
+
+    print(f"{'parser':<8}{'rows':>10}{'seconds':>10}{'rows/sec':>12}")
+    print(f"{'csv':<8}{len(csv_rows):>10}{csv_seconds:>10.2f}{len(csv_rows) / csv_seconds:>12.0f}")
+    print(f"{'arrow':<8}{len(arrow_rows):>10}{arrow_seconds:>10.2f}{len(arrow_rows) / arrow_seconds:>12.0f}")
+
+    mismatches = [i for i, (a, b) in enumerate(zip(csv_rows, arrow_rows)) if not same_row(a, b)]
+    if len(csv_rows) != len(arrow_rows) or mismatches:
+        first = mismatches[0] if mismatches else min(len(csv_rows), len(arrow_rows))
+        print(f"MISMATCH at row {first}")
+        raise SystemExit(1)
+    print("rows identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare product search latency of the old LIKE query against the
+trigram-indexed ILIKE search, at several table sizes.
+
+Usage:
+    python -m benchmarks.bench_search --sizes 100000 500000 2000000
+
+For each size a scratch table shaped like products is filled with
+synthetic rows and given the same pg_trgm GIN indexes as the migration.
+Each search term is run --repeat times per query and the median latency
+is reported. The scratch tables are dropped afterwards. Needs the pg_trgm
+extension (CREATE EXTENSION pg_trgm).
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+
+TERMS = ("widget", "sku-0012345", "blue steel", "zz-not-there")
+
+# The query list_products used to issue: no index can serve lower(col) LIKE
+LIKE_SQL = """
+SELECT id FROM {table}
+WHERE lower(sku) LIKE lower(:term)
+   OR lower(name) LIKE lower(:term)
+   OR lower(description) LIKE lower(:term)
+LIMIT 20
+"""
+
+# The current query: ILIKE served by the trigram indexes, ranked by relevance
+TRIGRAM_SQL = """
+SELECT id FROM {table}
+WHERE sku ILIKE :term OR name ILIKE :term OR description ILIKE :term
+ORDER BY greatest(similarity(sku, :raw), similarity(name, :raw),
+                  word_similarity(:raw, coalesce(description, ''))) DESC, id
+LIMIT 20
+"""
+
+SEED_SQL = """
+INSERT INTO {table} (id, sku, name, description, price, active)
+SELECT
+    i,
+    'sku-' || lpad(i::text, 7, '0'),
+    (ARRAY['Blue', 'Red', 'Green', 'Steel', 'Oak'])[1 + i % 5] || ' '
+        || (ARRAY['widget', 'gadget', 'bracket', 'panel', 'valve'])[1 + (i / 5) % 5] || ' ' || i,
+    'Synthetic product ' || i || ' made of '
+        || (ARRAY['blue steel', 'oak', 'plastic', 'aluminium'])[1 + i % 4],
+    (i % 10000) / 100.0,
+    true
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def median_ms(conn, sql: str, params: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 500000, 2000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    engine.echo = False
+
+    print(f"{'rows':>10}  {'term':<16}{'LIKE ms':>10}{'trigram ms':>12}")
+    for rows in args.sizes:
+        table = f"bench_search_{rows}"
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(f"CREATE TABLE {table} (LIKE products INCLUDING DEFAULTS)"))
+            conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id)"))
+            conn.execute(text(SEED_SQL.format(table=table)), {"rows": rows})
+            for column in ("sku", "name", "description"):
+                conn.execute(text(
+                    f"CREATE INDEX ON {table} USING gin ({column} gin_trgm_ops)"
+                ))
+            conn.execute(text(f"ANALYZE {table}"))
+
+        try:
+            with engine.connect() as conn:
+                for term in TERMS:
+                    params = {"term": f"%{term}%", "raw": term}
+                    like_ms = median_ms(conn, LIKE_SQL.format(table=table), params, args.repeat)
+                    trigram_ms = median_ms(conn, TRIGRAM_SQL.format(table=table), params, args.repeat)
+                    print(f"{rows:>10}  {term:<16}{like_ms:>10.1f}{trigram_ms:>12.1f}")
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+if __name__ == "__main__":
+    main()
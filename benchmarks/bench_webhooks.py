@@ -0,0 +1,119 @@
+"""
+Compare webhook deliveries per second of one worker: a fresh connection per
+delivery, sent one at a time (the old requests.post path), against the
+pooled DeliveryEngine sending concurrently over keep-alive connections.
+
+Usage:
+    python -m benchmarks.bench_webhooks --deliveries 2000 --latency-ms 50
+
+A stand-in HTTP/1.1 receiver runs in-process on localhost and answers
+every request after --latency-ms, like a remote endpoint would. Deliveries
+are spread over --hosts receiver ports, so the per-host limit
+(WEBHOOK_HOST_CONCURRENCY) applies per port. No database or broker is needed.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+
+from app.webhook_delivery import DeliveryEngine
+
+
+class Receiver:
+    """Minimal keep-alive HTTP server that counts requests and connections"""
+
+    def __init__(self, ports: list, latency: float, on_body=None):
+        self.ports = ports
+        self.latency = latency
+        self.on_body = on_body
+        self.requests = 0
+        self.connections = 0
+        self._loop = asyncio.new_event_loop()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                body = await reader.readexactly(length)
+                if self.on_body:
+                    self.on_body(body)
+                await asyncio.sleep(self.latency)
+                self.requests += 1
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        for port in self.ports:
+            await asyncio.start_server(self._handle, "127.0.0.1", port, backlog=1024)
+
+    def start(self):
+        asyncio.run_coroutine_threadsafe(self._serve(), self._loop)
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        time.sleep(0.2)
+
+
+def make_deliveries(count: int, ports: list) -> list:
+    body = json.dumps({"product_id": 1, "sku": "bench-sku", "name": "Bench", "price": "9.99"})
+    headers = {"Content-Type": "application/json", "X-Webhook-Event": "product.updated"}
+    return [
+        (f"http://127.0.0.1:{ports[i % len(ports)]}/hook", body, headers)
+        for i in range(count)
+    ]
+
+
+def run_unpooled(deliveries: list) -> float:
+    started = time.perf_counter()
+    for url, body, headers in deliveries:
+        httpx.post(url, content=body, headers=headers, timeout=10)
+    return time.perf_counter() - started
+
+
+def run_engine(engine: DeliveryEngine, deliveries: list, batch: int) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(deliveries), batch):
+        results = engine.deliver_many(deliveries[i:i + batch])
+        assert all(result.success for result in results)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deliveries", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500, help="deliveries handed to the engine at once")
+    parser.add_argument("--base-port", type=int, default=18080)
+    args = parser.parse_args()
+
+    ports = [args.base_port + i for i in range(args.hosts)]
+    receiver = Receiver(ports, args.latency_ms / 1000)
+    receiver.start()
+    engine = DeliveryEngine()
+
+    # The unpooled path is slow, so it gets a smaller sample
+    unpooled_count = min(args.deliveries, 200)
+    print(f"{'path':<10}{'deliveries':>12}{'seconds':>10}{'per sec':>10}{'connections':>13}")
+    for name, count, run in (
+        ("unpooled", unpooled_count, run_unpooled),
+        ("engine", args.deliveries, lambda d: run_engine(engine, d, args.batch)),
+    ):
+        connections_before = receiver.connections
+        seconds = run(make_deliveries(count, ports))
+        connections = receiver.connections - connections_before
+        print(f"{name:<10}{count:>12}{seconds:>10.2f}{count / seconds:>10.0f}{connections:>13}")
+
+
+if __name__ == "__main__":
+    main()
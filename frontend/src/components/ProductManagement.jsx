@@ -364,16 +364,38 @@ function ProductsView({ showNotification }) {
     }
   };
 
+  // Bulk deletes run as a background job; follow it until it completes
+  const listenDeleteProgress = (jobId) => {
+    const sse = new EventSource(`${API_BASE_URL}/progress/${jobId}`);
+    sse.onmessage = (e) => {
+      try {
+        const payload = JSON.parse(e.data);
+        if (payload.status === "complete") {
+          sse.close();
+          showNotification("success", payload.message || `Deleted ${payload.deleted_count} products`);
+          setPage(1);
+          fetchProducts();
+        }
+        if (payload.status === "error") {
+          sse.close();
+          showNotification("error", payload.message || "Failed to delete products");
+        }
+      } catch (err) {
+        console.error("Invalid SSE data", e.data);
+      }
+    };
+    sse.onerror = () => sse.close();
+  };
+
   const handleDeleteAll = async () => {
     try {
       const res = await fetch(`${API_BASE_URL}/products/bulk-delete`, { method: "DELETE" });
       const data = await res.json();
       
       if (res.ok) {
-        showNotification("success", data.message || `Deleted ${data.deleted_count} products`);
         setShowDeleteAll(false);
-        setPage(1);
-        fetchProducts();
+        showNotification("success", data.message || "Bulk delete started");
+        listenDeleteProgress(data.job_id);
       } else {
         showNotification("error", data.detail || "Failed to delete products");
       }
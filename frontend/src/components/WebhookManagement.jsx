@@ -447,7 +447,9 @@ function WebhookModal({ webhook, onClose, onSave, showNotification }) {
     event_type: webhook?.event_type || "product.created",
     enabled: webhook?.enabled ?? true,
     secret: webhook?.secret || "",
-    headers: webhook?.headers || ""
+    headers: webhook?.headers || "",
+    batch_window_seconds: webhook?.batch_window_seconds ?? "",
+    batch_max_events: webhook?.batch_max_events ?? ""
   });
   const [saving, setSaving] = useState(false);
   const [error, setError] = useState(null);
@@ -486,7 +488,11 @@ function WebhookModal({ webhook, onClose, onSave, showNotification }) {
       const res = await fetch(url, {
         method,
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(form)
+        body: JSON.stringify({
+          ...form,
+          batch_window_seconds: form.batch_window_seconds === "" ? null : Number(form.batch_window_seconds),
+          batch_max_events: form.batch_max_events === "" ? null : Number(form.batch_max_events)
+        })
       });
       if (!res.ok) {
         const data = await res.json();
@@ -611,6 +617,35 @@ function WebhookModal({ webhook, onClose, onSave, showNotification }) {
             />
           </div>
 
+          <div style={{ marginBottom: "1rem" }}>
+            <label style={labelStyle}>
+              Batching (Optional)
+              <span style={{ fontWeight: "normal", color: "#6b7280", marginLeft: "0.5rem" }}>
+                - Deliver events as one array per window or batch size
+              </span>
+            </label>
+            <div style={{ display: "flex", gap: "0.5rem" }}>
+              <input
+                type="number"
+                min="1"
+                max="3600"
+                value={form.batch_window_seconds}
+                onChange={(e) => setForm({ ...form, batch_window_seconds: e.target.value })}
+                placeholder="Window (seconds)"
+                style={inputStyle}
+              />
+              <input
+                type="number"
+                min="1"
+                max="10000"
+                value={form.batch_max_events}
+                onChange={(e) => setForm({ ...form, batch_max_events: e.target.value })}
+                placeholder="Max events"
+                style={inputStyle}
+              />
+            </div>
+          </div>
+
           <div style={{ marginBottom: "1.5rem" }}>
             <label style={{ display: "flex", alignItems: "center", cursor: "pointer" }}>
               <input
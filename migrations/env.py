@@ -3,6 +3,10 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
 from app.models.product import Base
+import app.models.outbox  # noqa: F401 (registers outbox_events on Base.metadata)
+import app.models.import_seen_sku  # noqa: F401
+import app.models.product_tombstone  # noqa: F401
+import app.models.job_checkpoint  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,28 @@
+"""Add (sku, id) index for keyset pagination
+
+Revision ID: a1c4e2b7d9f0
+Revises: 76903aac3fea
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c4e2b7d9f0'
+down_revision: Union[str, Sequence[str], None] = '76903aac3fea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_sku_id', 'products', ['sku', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_sku_id', table_name='products')
@@ -0,0 +1,36 @@
+"""Create job_checkpoints table for bulk product jobs
+
+Revision ID: a8c2e4f6b0d3
+Revises: f9b3d5a7c1e2
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c2e4f6b0d3'
+down_revision: Union[str, Sequence[str], None] = 'f9b3d5a7c1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('job_checkpoints',
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('part', sa.String(length=50), nullable=False),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('counts', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('job_id', 'part')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('job_checkpoints')
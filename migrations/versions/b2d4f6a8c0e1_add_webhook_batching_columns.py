@@ -0,0 +1,47 @@
+"""Add batching columns to webhooks
+
+Revision ID: b2d4f6a8c0e1
+Revises: a8c2e4f6b0d3
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a8c0e1'
+down_revision: Union[str, Sequence[str], None] = 'a8c2e4f6b0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # webhooks is created by create_all() when the app starts, with these
+    # columns; only a table created before them needs them added
+    columns = _webhook_columns()
+    if columns is None:
+        return
+    for name in ('batch_window_seconds', 'batch_max_events'):
+        if name not in columns:
+            op.add_column('webhooks', sa.Column(name, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    columns = _webhook_columns()
+    if columns is None:
+        return
+    for name in ('batch_max_events', 'batch_window_seconds'):
+        if name in columns:
+            op.drop_column('webhooks', name)
+
+
+def _webhook_columns():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('webhooks'):
+        return None
+    return {column['name'] for column in inspector.get_columns('webhooks')}
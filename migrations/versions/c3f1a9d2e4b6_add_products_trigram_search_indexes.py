@@ -0,0 +1,42 @@
+"""Add pg_trgm GIN indexes for product search
+
+Revision ID: c3f1a9d2e4b6
+Revises: a1c4e2b7d9f0
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a9d2e4b6'
+down_revision: Union[str, Sequence[str], None] = 'a1c4e2b7d9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Kept out of the Product model on purpose: they need the pg_trgm extension,
+# which metadata.create_all() doesn't install.
+SEARCH_COLUMNS = ('sku', 'name', 'description')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f'ix_products_{column}_trgm',
+            'products',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_products_{column}_trgm', table_name='products')
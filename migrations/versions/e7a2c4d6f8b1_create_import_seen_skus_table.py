@@ -0,0 +1,32 @@
+"""Create import_seen_skus table for sync imports
+
+Revision ID: e7a2c4d6f8b1
+Revises: d5e8b1f3a7c2
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a2c4d6f8b1'
+down_revision: Union[str, Sequence[str], None] = 'd5e8b1f3a7c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('import_seen_skus',
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('sku', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('job_id', 'sku')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('import_seen_skus')
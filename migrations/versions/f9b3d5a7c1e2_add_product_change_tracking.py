@@ -0,0 +1,45 @@
+"""Add products.change_xid and product_tombstones for the change feed
+
+Revision ID: f9b3d5a7c1e2
+Revises: e7a2c4d6f8b1
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9b3d5a7c1e2'
+down_revision: Union[str, Sequence[str], None] = 'e7a2c4d6f8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CURRENT_XID = sa.text("(pg_current_xact_id()::text::bigint)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows get 0 without a table rewrite; new writes are stamped
+    op.add_column('products', sa.Column('change_xid', sa.BigInteger(), nullable=False, server_default='0'))
+    op.alter_column('products', 'change_xid', server_default=CURRENT_XID)
+    op.create_index('ix_products_change_xid_id', 'products', ['change_xid', 'id'], unique=False)
+    op.create_table('product_tombstones',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('sku', sa.String(length=100), nullable=True),
+    sa.Column('change_xid', sa.BigInteger(), server_default=CURRENT_XID, nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_tombstones_change_xid_id', 'product_tombstones', ['change_xid', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_tombstones_change_xid_id', table_name='product_tombstones')
+    op.drop_table('product_tombstones')
+    op.drop_index('ix_products_change_xid_id', table_name='products')
+    op.drop_column('products', 'change_xid')
@@ -1,7 +1,8 @@
 #!/bin/bash
 
-# Start Celery worker in background with limited concurrency
-celery -A app.celery_app worker --loglevel=info --concurrency=1 &
+# Start Celery worker in background with limited concurrency, with the beat
+# scheduler embedded (-B) for periodic tasks; run only one worker with -B
+celery -A app.celery_app worker -B --loglevel=info --concurrency=1 &
 
 # Give celery a moment to start
 sleep 2
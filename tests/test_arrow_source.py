@@ -0,0 +1,51 @@
+import codecs
+import csv
+
+import pytest
+
+from app.csv_source import CsvSource, find_shard_ranges
+
+pytest.importorskip("pyarrow")
+from app.arrow_source import ArrowCsvSource  # noqa: E402
+
+
+def _write_catalog(path, rows: int, bom: bool = False):
+    with open(path, "wb") as fh:
+        if bom:
+            fh.write(codecs.BOM_UTF8)
+    with open(path, "a", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["sku", "name", "description", "price"])
+        for i in range(rows):
+            writer.writerow([f"sku-{i}", f"Produkt {i} é", "", f"{i}.99"])
+
+
+def _csv_rows(path, ranges) -> list:
+    rows = []
+    for start, end in ranges:
+        with CsvSource(str(path), start, end) as source:
+            rows.extend((row["sku"], row["name"], row["price"]) for row in source)
+    return rows
+
+
+def _arrow_rows(path, ranges) -> list:
+    rows = []
+    for start, end in ranges:
+        with ArrowCsvSource(str(path), start, end) as source:
+            for batch in source.iter_batches(1000):
+                columns = batch.to_pydict()
+                rows.extend(zip(columns["sku"], columns["name"], columns["price"]))
+    return rows
+
+
+@pytest.mark.parametrize("shards", [1, 4])
+def test_parsers_read_the_same_rows_with_byte_order_mark(tmp_path, shards):
+    plain, marked = tmp_path / "plain.csv", tmp_path / "marked.csv"
+    _write_catalog(plain, 3000)
+    _write_catalog(marked, 3000, bom=True)
+
+    expected = _csv_rows(plain, [(None, None)])
+    assert len(expected) == 3000
+    ranges = find_shard_ranges(str(marked), shards) if shards > 1 else [(None, None)]
+    assert _csv_rows(marked, ranges) == expected
+    assert _arrow_rows(marked, ranges) == expected
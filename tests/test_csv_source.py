@@ -0,0 +1,45 @@
+import csv
+
+import pytest
+
+from app.csv_source import CsvSource, find_shard_ranges
+
+
+def _write_catalog(path, rows: int):
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["sku", "name", "description", "price"])
+        for i in range(rows):
+            if i == 10:
+                # Stray quote in an unquoted field: literal for csv
+                fh.write(f'sku-{i},12" pizza,plain,{i}.99\r\n')
+            elif i % 7 == 0:
+                writer.writerow([f"sku-{i}", f"Product {i}", 'Line one\nline "two"\n, three', f"{i}.99"])
+            else:
+                writer.writerow([f"sku-{i}", f"Product {i}", "", f"{i}.99"])
+
+
+@pytest.mark.parametrize("shards", [2, 4, 8])
+def test_shards_match_serial_read_with_stray_quote(tmp_path, shards):
+    path = tmp_path / "catalog.csv"
+    _write_catalog(path, 5000)
+    with open(path, newline="") as fh:
+        serial = list(csv.DictReader(fh))
+
+    ranges = find_shard_ranges(str(path), shards)
+    assert len(ranges) == shards
+    sharded = []
+    for start, end in ranges:
+        with CsvSource(str(path), start, end) as source:
+            sharded.extend(source)
+
+    assert len(sharded) == len(serial) == 5000
+    assert sharded == serial
+
+
+def test_single_shard_is_whole_data(tmp_path):
+    path = tmp_path / "catalog.csv"
+    _write_catalog(path, 20)
+    with open(path, "rb") as fh:
+        header = len(fh.readline())
+    assert find_shard_ranges(str(path), 1) == [(header, path.stat().st_size)]